@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Export the human / non-human classifier trained in train.ipynb to TFLite.
+
+The backend loads the exported file as a fast pre-check in front of the
+virtual try-on (see backend/human_gate.py).
+
+Usage:
+    python export_tflite.py human_classifier.keras
+    python export_tflite.py human_classifier.keras --output ../backend/models/human_classifier.tflite
+"""
+
+import argparse
+import os
+import sys
+
+import tensorflow as tf
+
+DEFAULT_OUTPUT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'models', 'human_classifier.tflite'
+)
+
+
+def export(model_path, output_path, quantize=True):
+    """Convert a saved Keras model to a TFLite flatbuffer"""
+    model = tf.keras.models.load_model(model_path)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize:
+        # Dynamic-range quantization: int8 weights, float activations.
+        # Shrinks the Dense(512) layer ~4x and speeds up CPU inference.
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    tflite_model = converter.convert()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+    print(f"✅ Exported {model_path} -> {output_path} ({len(tflite_model) / 1024:.0f} KiB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('model', help="Keras model saved from train.ipynb (.keras or .h5)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Where to write the .tflite file")
+    parser.add_argument('--no-quantize', action='store_true', help="Keep float32 weights")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Model not found: {args.model}")
+        sys.exit(1)
+
+    export(args.model, args.output, quantize=not args.no_quantize)
+
+
+if __name__ == "__main__":
+    main()
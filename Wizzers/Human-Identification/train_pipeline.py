@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+tf.data training pipeline for the human / non-human classifier.
+
+Replaces ImageDataGenerator.flow_from_directory from train.ipynb: JPEGs are
+decoded and resized in parallel once, written to TFRecord shards of uint8
+150x150 pixels, and every epoch after that only reads the shards, batches and
+prefetches. Mixed precision is turned on when a GPU is available.
+
+Usage:
+    python train_pipeline.py --data model_dataset --epochs 100
+    python train_pipeline.py --data model_dataset --benchmark-only
+"""
+
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+
+import tensorflow as tf
+
+IMAGE_SIZE = (150, 150)
+BATCH_SIZE = 32
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def list_images(split_dir):
+    """Return (paths, labels, class_names) the way flow_from_directory labels them"""
+    class_names = sorted(
+        name for name in os.listdir(split_dir) if os.path.isdir(os.path.join(split_dir, name))
+    )
+    paths, labels = [], []
+    for label, name in enumerate(class_names):
+        for path in sorted(glob.glob(os.path.join(split_dir, name, '*'))):
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(path)
+                labels.append(label)
+    return paths, labels, class_names
+
+
+def decode_and_resize(path, label):
+    """Decode any supported image to a 150x150 uint8 RGB tensor"""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, IMAGE_SIZE, method='nearest')
+    return tf.cast(image, tf.uint8), label
+
+
+def _serialize(image, label):
+    example = tf.train.Example(features=tf.train.Features(feature={
+        'image': tf.train.Feature(bytes_list=tf.train.BytesList(value=[image.numpy().tobytes()])),
+        'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[int(label)])),
+    }))
+    return example.SerializeToString()
+
+
+def build_shards(split_dir, cache_dir, num_shards=8, seed=0):
+    """Decode every image once and write it to TFRecord shards; returns the shard paths"""
+    paths, labels, class_names = list_images(split_dir)
+    if not paths:
+        raise ValueError(f"No images found in {split_dir}")
+
+    summary = f"{len(paths)} images, classes: {','.join(class_names)}, shuffled with seed {seed}\n"
+    marker = os.path.join(cache_dir, '_COMPLETE')
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if f.read() == summary:
+                return sorted(glob.glob(os.path.join(cache_dir, '*.tfrecord')))
+    print(f"Preprocessing {len(paths)} images from {split_dir} ({class_names})...")
+
+    # list_images returns the files class by class, and training only shuffles within a
+    # 2048-example buffer; mix the classes across and within shards once, reproducibly
+    order = random.Random(seed).sample(range(len(paths)), len(paths))
+    paths = [paths[i] for i in order]
+    labels = [labels[i] for i in order]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    dataset = (
+        tf.data.Dataset.from_tensor_slices((paths, labels))
+        .map(decode_and_resize, num_parallel_calls=AUTOTUNE, deterministic=True)
+        .prefetch(AUTOTUNE)
+    )
+
+    shard_paths = [os.path.join(cache_dir, f'{i:03d}.tfrecord') for i in range(num_shards)]
+    writers = [tf.io.TFRecordWriter(path) for path in shard_paths]
+    try:
+        for index, (image, label) in enumerate(dataset):
+            writers[index % num_shards].write(_serialize(image, label))
+    finally:
+        for writer in writers:
+            writer.close()
+
+    with open(marker, 'w') as f:
+        f.write(summary)
+    return shard_paths
+
+
+def _parse(record):
+    features = tf.io.parse_single_example(record, {
+        'image': tf.io.FixedLenFeature([], tf.string),
+        'label': tf.io.FixedLenFeature([], tf.int64),
+    })
+    image = tf.reshape(tf.io.decode_raw(features['image'], tf.uint8), IMAGE_SIZE + (3,))
+    # Same rescale=1./255 as the notebook's ImageDataGenerator
+    image = tf.cast(image, tf.float32) / 255.0
+    return image, tf.cast(features['label'], tf.float32)
+
+
+def make_dataset(shard_paths, training, batch_size=BATCH_SIZE):
+    """Read preprocessed shards into a batched, prefetched dataset"""
+    dataset = tf.data.Dataset.from_tensor_slices(shard_paths)
+    if training:
+        dataset = dataset.shuffle(len(shard_paths))
+    dataset = dataset.interleave(
+        tf.data.TFRecordDataset, cycle_length=len(shard_paths),
+        num_parallel_calls=AUTOTUNE, deterministic=not training,
+    )
+    if training:
+        dataset = dataset.shuffle(2048)
+    return (
+        dataset.map(_parse, num_parallel_calls=AUTOTUNE)
+        .batch(batch_size)
+        .prefetch(AUTOTUNE)
+    )
+
+
+def build_model():
+    """Same architecture as train.ipynb"""
+    from tensorflow.keras.layers import Conv2D, Dense, Flatten, MaxPooling2D
+    from tensorflow.keras.models import Sequential
+
+    model = Sequential([
+        Conv2D(32, (3, 3), activation='relu', input_shape=IMAGE_SIZE + (3,)),
+        MaxPooling2D(2, 2),
+        Conv2D(64, (3, 3), activation='relu'),
+        MaxPooling2D(2, 2),
+        Conv2D(128, (3, 3), activation='relu'),
+        MaxPooling2D(2, 2),
+        Conv2D(128, (3, 3), activation='relu'),
+        MaxPooling2D(2, 2),
+        Flatten(),
+        Dense(512, activation='relu'),
+        # Keep the output in float32 so the sigmoid/loss stay stable under mixed precision
+        Dense(1, activation='sigmoid', dtype='float32'),
+    ])
+    model.compile(loss='binary_crossentropy', optimizer='adam', metrics=['accuracy'])
+    return model
+
+
+def enable_mixed_precision():
+    """Use float16 compute on GPUs; CPUs gain nothing from it"""
+    if tf.config.list_physical_devices('GPU'):
+        tf.keras.mixed_precision.set_global_policy('mixed_float16')
+        print("Mixed precision enabled (mixed_float16)")
+        return True
+    return False
+
+
+def benchmark_input(dataset, batches=200):
+    """Iterate the input pipeline alone and report images/sec"""
+    images = 0
+    start = time.perf_counter()
+    for image_batch, _ in dataset.take(batches):
+        images += int(image_batch.shape[0])
+    elapsed = time.perf_counter() - start
+    rate = images / elapsed if elapsed else 0.0
+    print(f"Input pipeline: {images} images in {elapsed:.2f}s ({rate:.0f} images/sec)")
+    return rate
+
+
+class ThroughputCallback(tf.keras.callbacks.Callback):
+    """Print training images/sec at the end of every epoch"""
+
+    def __init__(self, batch_size):
+        super().__init__()
+        self.batch_size = batch_size
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+        self._batches = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._batches += 1
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._start
+        rate = self._batches * self.batch_size / elapsed if elapsed else 0.0
+        print(f" - {rate:.0f} images/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='model_dataset', help="Directory with train/ and test/ class folders")
+    parser.add_argument('--cache', default=None, help="Where to write TFRecord shards (default: <data>/_shards); delete it after changing the dataset")
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--output', default='human_classifier.keras', help="Where to save the trained model")
+    parser.add_argument('--benchmark-only', action='store_true', help="Only measure input pipeline throughput")
+    args = parser.parse_args()
+
+    train_dir = os.path.join(args.data, 'train')
+    test_dir = os.path.join(args.data, 'test')
+    if not os.path.isdir(train_dir):
+        print(f"❌ Training directory not found: {train_dir}")
+        sys.exit(1)
+
+    cache_dir = args.cache or os.path.join(args.data, '_shards')
+    train_shards = build_shards(train_dir, os.path.join(cache_dir, 'train'))
+    train_ds = make_dataset(train_shards, training=True, batch_size=args.batch_size)
+    benchmark_input(train_ds)
+    if args.benchmark_only:
+        return
+
+    val_ds = None
+    if os.path.isdir(test_dir):
+        test_shards = build_shards(test_dir, os.path.join(cache_dir, 'test'))
+        val_ds = make_dataset(test_shards, training=False, batch_size=args.batch_size)
+
+    enable_mixed_precision()
+    model = build_model()
+    model.fit(
+        train_ds,
+        epochs=args.epochs,
+        validation_data=val_ds,
+        callbacks=[ThroughputCallback(args.batch_size)],
+        verbose=1,
+    )
+    model.save(args.output)
+    print(f"✅ Saved model to {args.output}; export it with: python export_tflite.py {args.output}")
+
+
+if __name__ == "__main__":
+    main()
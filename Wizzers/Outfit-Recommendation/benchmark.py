@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality and latency benchmark for the outfit recommender.
+
+Builds a labelled query set from styles.csv attributes ("navy blue tshirts for
+men", "white shirts for formal", ...): a product is relevant to a query when it
+has every attribute the query was made from. Each retrieval mode is run over the
+same queries and reported with recall@k, MRR@k, queries/sec and p50/p99 latency,
+so a change to the recommender can be judged on quality and speed together.
+
+Modes:
+    dense                     exact CLIP search in memory
+    bm25                      BM25 over the metadata sentences
+    hybrid-sparse-heavy/-neutral/-dense-heavy
+                              Train.ipynb's EnsembleRetriever weights (0.8/0.2, 0.5/0.5, 0.2/0.8)
+    qdrant                    dense search through a Qdrant collection
+    qdrant-quantized          same, on an int8 scalar-quantized collection
+    image-dense, image-qdrant "shop the look": a catalog photo as the query, pre-filtered
+                              on its gender and articleType; relevant products also share
+                              its baseColour
+
+Requires pandas, sentence_transformers, qdrant-client and rank-bm25 (the
+Train.ipynb dependencies).
+
+Usage:
+    python benchmark.py --styles styles.csv --images images --qdrant-url http://localhost:6333
+    python benchmark.py --styles styles.csv --images images --modes dense bm25 --compare results/baseline.json
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+import retrieval
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Attributes a query is built from, and how it is phrased
+QUERY_TEMPLATES = {
+    ('baseColour', 'articleType', 'gender'): "{baseColour} {articleType} for {gender}",
+    # The shape of the backend's /handleocassion query ("<color> shirt for <occasion>")
+    ('baseColour', 'articleType', 'usage'): "{baseColour} {articleType} for {usage}",
+    ('baseColour', 'usage'): "{baseColour} clothes for {usage} wear",
+}
+
+HYBRID_WEIGHTS = {
+    'hybrid-sparse-heavy': (0.8, 0.2),
+    'hybrid-neutral': (0.5, 0.5),
+    'hybrid-dense-heavy': (0.2, 0.8),
+}
+
+IMAGE_MODES = ('image-dense', 'image-qdrant')
+MODES = ('dense', 'bm25') + tuple(HYBRID_WEIGHTS) + ('qdrant', 'qdrant-quantized') + IMAGE_MODES
+
+# Image queries filter on these and are judged on matching the query photo's colour too
+IMAGE_FILTERS = ('gender', 'articleType')
+
+
+def build_queries(catalog, per_template=50, min_relevant=5, seed=0):
+    """Sample attribute combinations with at least `min_relevant` products each"""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for fields, template in QUERY_TEMPLATES.items():
+        groups = [
+            (values, set(group['id'].tolist()))
+            for values, group in catalog.dropna(subset=list(fields)).groupby(list(fields))
+            if len(group) >= min_relevant
+        ]
+        for index in sorted(rng.permutation(len(groups))[:per_template]):
+            values, relevant = groups[index]
+            text = template.format(**dict(zip(fields, values))).lower()
+            queries.append({'text': text, 'relevant': relevant, 'template': '+'.join(fields)})
+    return queries
+
+
+def build_image_queries(catalog, count=100, min_relevant=5, seed=0):
+    """Catalog photos as queries; relevant = other products with the same gender/articleType/baseColour"""
+    rng = np.random.default_rng(seed)
+    fields = list(IMAGE_FILTERS) + ['baseColour']
+    candidates = []
+    for _, group in catalog.dropna(subset=fields).groupby(fields):
+        if len(group) > min_relevant:
+            ids = set(group['id'].tolist())
+            # The query photo itself is excluded from its results, so it is never relevant
+            candidates.extend((row, ids - {catalog.at[row, 'id']}) for row in group.index)
+    queries = []
+    for index in sorted(rng.permutation(len(candidates))[:count]):
+        row, relevant = candidates[index]
+        product = catalog.loc[row]
+        queries.append({
+            'text': f"photo of {product['id']}",
+            'row': row,
+            'exclude': product['id'],
+            'filters': {field: product[field] for field in IMAGE_FILTERS},
+            'relevant': relevant,
+            'template': 'image',
+        })
+    return queries
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values), max(1, math.ceil(fraction * len(sorted_values)))) - 1
+    return sorted_values[index]
+
+
+def evaluate(retriever, queries, vectors, k, reference=None):
+    """Run every query once; return quality and latency stats (and the result lists)"""
+    latencies, results = [], []
+    recall = reciprocal_rank = 0.0
+    started = time.perf_counter()
+    for query, vector in zip(queries, vectors):
+        exclude = query.get('exclude')
+        start = time.perf_counter()
+        retrieved = retriever.search(query['text'], vector, k + 1 if exclude else k, query.get('filters'))
+        latencies.append(time.perf_counter() - start)
+        # Image queries: the query product itself is not a recommendation
+        retrieved = [_id for _id in retrieved if _id != exclude][:k]
+        results.append(retrieved)
+
+        relevant = query['relevant']
+        hits = [rank for rank, _id in enumerate(retrieved, start=1) if _id in relevant]
+        # Relevant sets are often larger than k, so recall is capped at k
+        recall += len(hits) / min(k, len(relevant))
+        reciprocal_rank += 1 / hits[0] if hits else 0.0
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    count = len(queries)
+    stats = {
+        'queries': count,
+        f'recall@{k}': round(recall / count, 4),
+        f'mrr@{k}': round(reciprocal_rank / count, 4),
+        'qps': round(count / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+    if reference is not None:
+        # How much of the exact top-k an approximate index returns
+        overlap = sum(len(set(a) & set(b)) / k for a, b in zip(results, reference))
+        stats['exact_overlap'] = round(overlap / count, 4)
+    return stats, results
+
+
+def time_encoder(model, queries):
+    """Per-query CLIP text-encoding latency, which every dense mode pays on top of search"""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        retrieval.encode_texts(model, [query['text']])
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def build_retrievers(modes, catalog, vectors, args):
+    retrievers = {}
+    dense = retrieval.DenseRetriever(catalog, vectors)
+    bm25 = retrieval.BM25Retriever(catalog) if 'bm25' in modes or set(modes) & set(HYBRID_WEIGHTS) else None
+    if 'dense' in modes:
+        retrievers['dense'] = dense
+    if 'bm25' in modes:
+        retrievers['bm25'] = bm25
+    for mode, weights in HYBRID_WEIGHTS.items():
+        if mode in modes:
+            retrievers[mode] = retrieval.HybridRetriever([bm25, dense], weights)
+
+    if 'image-dense' in modes:
+        retrievers['image-dense'] = dense
+
+    collections = {
+        'qdrant': ('qdrant' in modes or 'image-qdrant' in modes, False),
+        'qdrant-quantized': ('qdrant-quantized' in modes, True),
+    }
+    if any(needed for needed, _ in collections.values()):
+        client = retrieval.connect(args.qdrant_url, os.environ.get('QDRANT_API_KEY'))
+        for mode, (needed, quantized) in collections.items():
+            if needed:
+                name = f"{args.collection}_{mode.replace('-', '_')}"
+                print(f"🚀 Uploading {len(catalog)} vectors to {name}...")
+                retrieval.build_collection(client, name, catalog, vectors, quantized=quantized)
+                retrievers[mode] = retrieval.QdrantRetriever(client, name)
+        if 'image-qdrant' in modes:
+            retrievers['image-qdrant'] = retrievers['qdrant']
+        if 'qdrant' not in modes:
+            retrievers.pop('qdrant', None)
+    return retrievers
+
+
+def print_report(results, k, baseline=None):
+    header = f"{'mode':<22}{f'recall@{k}':>11}{f'mrr@{k}':>9}{'qps':>10}{'p50 ms':>10}{'p99 ms':>10}{'exact':>8}"
+    print("\n" + header)
+    print("-" * len(header))
+    for mode, stats in results.items():
+        print(
+            f"{mode:<22}{stats[f'recall@{k}']:>11}{stats[f'mrr@{k}']:>9}{stats['qps']:>10}"
+            f"{stats['p50_ms']:>10}{stats['p99_ms']:>10}{str(stats.get('exact_overlap', '-')):>8}"
+        )
+        if baseline and mode in baseline:
+            old = baseline[mode]
+            deltas = []
+            for key in (f'recall@{k}', f'mrr@{k}', 'qps', 'p99_ms'):
+                if old.get(key) and stats.get(key) is not None:
+                    deltas.append(f"{key} {100 * (stats[key] - old[key]) / old[key]:+.1f}%")
+            if deltas:
+                print(f"{'':<22}vs baseline: {', '.join(deltas)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--styles', required=True, help="fashion-product-images-small/styles.csv")
+    parser.add_argument('--images', required=True, help="fashion-product-images-small/images")
+    parser.add_argument('--limit', type=int, default=None, help="Only index the first N products")
+    parser.add_argument('--embeddings', default='image_embeddings.npz', help="Cache for the CLIP image vectors")
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries-per-template', type=int, default=50)
+    parser.add_argument('--image-queries', type=int, default=100, help="Photos used as queries by the image modes")
+    parser.add_argument('--min-relevant', type=int, default=5, help="Skip attribute combinations with fewer products")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--qdrant-url', default=None, help="Qdrant server (default: in-process local mode)")
+    parser.add_argument('--collection', default=f"{retrieval.COLLECTION_NAME}_bench")
+    parser.add_argument('--label', default=None, help="Name of the results file (default: timestamp)")
+    parser.add_argument('--compare', default=None, help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    catalog = retrieval.load_catalog(args.styles, args.images, limit=args.limit)
+    print(f"✅ Catalog: {len(catalog)} products")
+    model = retrieval.load_model()
+    vectors = retrieval.encode_images(model, catalog, args.images, cache_path=args.embeddings)
+
+    queries = build_queries(catalog, args.queries_per_template, args.min_relevant, args.seed)
+    print(f"✅ {len(queries)} queries, e.g. {', '.join(repr(q['text']) for q in queries[:3])}")
+    query_vectors = retrieval.encode_texts(model, [query['text'] for query in queries])
+
+    image_queries = build_image_queries(catalog, args.image_queries, args.min_relevant, args.seed)
+    # The photos are already in the index, so reuse their vectors instead of re-encoding
+    image_vectors = vectors[[query['row'] for query in image_queries]]
+    if set(args.modes) & set(IMAGE_MODES):
+        print(f"✅ {len(image_queries)} image queries filtered on {', '.join(IMAGE_FILTERS)}")
+
+    retrievers = build_retrievers(args.modes, catalog, vectors, args)
+    exact = {}
+    if any(mode.startswith('qdrant') for mode in retrievers):
+        _, exact['text'] = evaluate(retrieval.DenseRetriever(catalog, vectors), queries, query_vectors, args.k)
+    if 'image-qdrant' in retrievers:
+        _, exact['image'] = evaluate(
+            retrieval.DenseRetriever(catalog, vectors), image_queries, image_vectors, args.k
+        )
+
+    results = {}
+    for mode, retriever in retrievers.items():
+        print(f"⏱️  {mode}")
+        kind = 'image' if mode in IMAGE_MODES else 'text'
+        mode_queries, mode_vectors = (image_queries, image_vectors) if kind == 'image' else (queries, query_vectors)
+        # Untimed pass so lazy initialisation and caches don't land in p99
+        evaluate(retriever, mode_queries[:5], mode_vectors[:5], args.k)
+        results[mode], _ = evaluate(
+            retriever, mode_queries, mode_vectors, args.k,
+            reference=exact[kind] if 'qdrant' in mode else None,
+        )
+    encoder = time_encoder(model, queries)
+
+    print_report(results, args.k, baseline)
+    print(f"\nQuery encoding (dense and hybrid modes): p50 {encoder['p50_ms']} ms, p99 {encoder['p99_ms']} ms")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    label = args.label or datetime.now().strftime('%Y%m%d-%H%M%S')
+    output_path = os.path.join(RESULTS_DIR, f'{label}.json')
+    config = {key: value for key, value in vars(args).items() if key not in ('compare', 'label')}
+    config['products'] = len(catalog)
+    with open(output_path, 'w') as f:
+        json.dump({
+            'label': label,
+            'timestamp': datetime.now().isoformat(),
+            'config': config,
+            'query_encoding': encoder,
+            'results': results,
+        }, f, indent=2)
+    print(f"\n💾 Results saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
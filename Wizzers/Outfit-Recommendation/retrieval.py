@@ -0,0 +1,287 @@
+"""
+Retrieval building blocks for the outfit recommender, shared by benchmark.py
+and Predict.ipynb.
+
+Builds the same catalog, sentences and CLIP image index as Train.ipynb (styles.csv
+Topwear rows, one sentence of metadata per product, 512-d CLIP vectors in a
+cosine Qdrant collection) and wraps each way of searching it -- exact dense,
+Qdrant dense (optionally int8-quantized), BM25 and the weighted hybrids -- behind
+one `search(text, vector, k, filters=None)` call returning product ids.
+
+Because the index holds CLIP image vectors, a photo embedded with the CLIP image
+encoder (`encode_image`) can be searched exactly like a text query. `filters`
+({'gender': 'Men', 'baseColour': ['Black', 'Grey']}, ...) restrict the search
+to matching products before ranking; in Qdrant this is a payload filter on
+indexed keyword fields, evaluated inside the HNSW search.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+MODEL_NAME = 'sentence-transformers/clip-ViT-B-32'
+VECTOR_SIZE = 512
+COLLECTION_NAME = "semantic_image_search"
+# Reciprocal-rank constant used by langchain's EnsembleRetriever
+RRF_C = 60
+UPSERT_BATCH = 256
+# styles.csv attributes stored in the point payload and indexed for pre-filtering
+FILTER_FIELDS = ('gender', 'articleType', 'baseColour', 'usage')
+
+
+def load_catalog(styles_csv, images_dir=None, sub_category='Topwear', limit=None):
+    """styles.csv rows that have an image, with the metadata sentence Train.ipynb indexes"""
+    catalog = pd.read_csv(styles_csv, on_bad_lines='skip')
+    if sub_category:
+        catalog = catalog[catalog['subCategory'] == sub_category]
+    if images_dir:
+        catalog = catalog[[os.path.exists(os.path.join(images_dir, f"{_id}.jpg")) for _id in catalog['id']]]
+    if limit:
+        catalog = catalog.head(limit)
+    catalog = catalog.drop(columns=['year'], errors='ignore').reset_index(drop=True)
+    # Same as metadata_as_sentences(): every column but the id, space separated
+    catalog['sentence'] = [" ".join(str(value) for value in row[1:]) for row in catalog.itertuples(index=False)]
+    return catalog
+
+
+def load_model(name=MODEL_NAME):
+    from sentence_transformers import SentenceTransformer
+    import torch
+
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    return SentenceTransformer(name, device=device)
+
+
+def encode_images(model, catalog, images_dir, cache_path=None, batch_size=64):
+    """L2-normalised CLIP vectors for every catalog image, cached as .npz (ids + vectors) keyed by product id"""
+    ids = catalog['id'].to_numpy()
+    if cache_path and os.path.exists(cache_path):
+        cached = np.load(cache_path)
+        if np.array_equal(cached['ids'], ids):
+            print(f"✅ Loaded {len(ids)} image embeddings from {cache_path}")
+            return cached['vectors']
+        print(f"⚠️ {cache_path} was built for a different catalog; re-encoding")
+
+    from PIL import Image
+
+    vectors = []
+    for start in range(0, len(ids), batch_size):
+        images = [Image.open(os.path.join(images_dir, f"{_id}.jpg")) for _id in ids[start:start + batch_size]]
+        vectors.append(model.encode(images, batch_size=batch_size, normalize_embeddings=True))
+        print(f"Encoded {min(start + batch_size, len(ids))}/{len(ids)} images", end='\r')
+    print()
+    vectors = np.vstack(vectors).astype(np.float32)
+
+    if cache_path:
+        np.savez(cache_path, ids=ids, vectors=vectors)
+    return vectors
+
+
+def encode_texts(model, texts):
+    return model.encode(list(texts), normalize_embeddings=True).astype(np.float32)
+
+
+def encode_image(model, image):
+    """CLIP vector for one photo (PIL image or path), comparable with the index vectors"""
+    from PIL import Image
+
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+    return model.encode([image.convert('RGB')], normalize_embeddings=True)[0].astype(np.float32)
+
+
+def product_payload(row):
+    """Point payload in the layout langchain's Qdrant store reads, plus the filter fields"""
+    metadata = {"image_id": int(row['id'])}
+    for field in FILTER_FIELDS:
+        if isinstance(row.get(field), str):
+            metadata[field] = row[field]
+    return {"metadata": metadata, "page_content": row['sentence']}
+
+
+def make_filter(filters):
+    """Qdrant payload filter for {'field': value or [values]}; None when nothing is filtered"""
+    from qdrant_client.models import FieldCondition, Filter, MatchAny, MatchValue
+
+    conditions = []
+    for field, value in (filters or {}).items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Cannot filter on {field!r}, choose from {', '.join(FILTER_FIELDS)}")
+        if not value:
+            continue
+        match = MatchAny(any=list(value)) if isinstance(value, (list, tuple, set)) else MatchValue(value=value)
+        conditions.append(FieldCondition(key=f"metadata.{field}", match=match))
+    return Filter(must=conditions) if conditions else None
+
+
+def index_filter_fields(client, name, catalog=None):
+    """Create keyword indexes for FILTER_FIELDS, backfilling the payload of an older collection.
+
+    Collections built before the filter fields existed only carry image_id; pass
+    the catalog to copy gender/articleType/baseColour/usage onto every point.
+    A product missing one of them still gets the others, as in product_payload.
+    """
+    from qdrant_client.models import FieldCondition, Filter, MatchAny, PayloadSchemaType
+
+    if catalog is not None:
+        client.create_payload_index(name, "metadata.image_id", field_schema=PayloadSchemaType.INTEGER)
+        # One set_payload call per field value instead of one per point
+        for field in FILTER_FIELDS:
+            for value, group in catalog.dropna(subset=[field]).groupby(field):
+                client.set_payload(
+                    collection_name=name,
+                    payload={field: value},
+                    key="metadata",
+                    points=Filter(must=[
+                        FieldCondition(key="metadata.image_id", match=MatchAny(any=[int(_id) for _id in group['id']]))
+                    ]),
+                    wait=True,
+                )
+    for field in FILTER_FIELDS:
+        client.create_payload_index(name, f"metadata.{field}", field_schema=PayloadSchemaType.KEYWORD)
+
+
+def connect(url=None, api_key=None):
+    """QdrantClient for `url`, or an in-process one when no server is given"""
+    from qdrant_client import QdrantClient
+
+    if url:
+        return QdrantClient(url=url, api_key=api_key)
+    print("⚠️ No Qdrant URL given; using local mode (exact search, HNSW and quantization are ignored)")
+    return QdrantClient(":memory:")
+
+
+def build_collection(client, name, catalog, vectors, quantized=False):
+    """(Re)create `name` with the Train.ipynb payload layout and upload every vector"""
+    from qdrant_client.models import (
+        Distance, PointStruct, ScalarQuantization, ScalarQuantizationConfig, ScalarType, VectorParams,
+    )
+
+    quantization = None
+    if quantized:
+        quantization = ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(
+        name,
+        vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE),
+        quantization_config=quantization,
+    )
+
+    rows = catalog.to_dict('records')
+    for start in range(0, len(rows), UPSERT_BATCH):
+        client.upsert(
+            collection_name=name,
+            wait=True,
+            points=[
+                PointStruct(id=i, vector=vectors[i].tolist(), payload=product_payload(rows[i]))
+                for i in range(start, min(start + UPSERT_BATCH, len(rows)))
+            ],
+        )
+    index_filter_fields(client, name)
+
+
+def _top_k(scores, k):
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=int)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class _CatalogFilter:
+    """In-memory counterpart of make_filter: row indices matching the filters"""
+
+    def __init__(self, catalog):
+        self.columns = {field: catalog[field].to_numpy() for field in FILTER_FIELDS if field in catalog}
+
+    def rows(self, filters):
+        mask = None
+        for field, value in (filters or {}).items():
+            if not value:
+                continue
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            matches = np.isin(self.columns[field], values)
+            mask = matches if mask is None else mask & matches
+        return None if mask is None else np.flatnonzero(mask)
+
+
+class DenseRetriever:
+    """Exact cosine search over the in-memory vectors (no vector database)"""
+
+    def __init__(self, catalog, vectors):
+        self.ids = catalog['id'].to_numpy()
+        self.vectors = vectors
+        self.filter = _CatalogFilter(catalog)
+
+    def search(self, text, vector, k, filters=None):
+        rows = self.filter.rows(filters)
+        if rows is None:
+            return self.ids[_top_k(self.vectors @ vector, k)].tolist()
+        # Only score the matching products
+        return self.ids[rows[_top_k(self.vectors[rows] @ vector, k)]].tolist()
+
+
+class QdrantRetriever:
+    """Dense search through a Qdrant collection, as Predict.ipynb's get_link does"""
+
+    def __init__(self, client, collection_name, rescore=True):
+        from qdrant_client.models import QuantizationSearchParams, SearchParams
+
+        self.client = client
+        self.collection_name = collection_name
+        # Quantized collections: oversample on int8 vectors, then rescore with the originals
+        self.params = SearchParams(quantization=QuantizationSearchParams(rescore=rescore, oversampling=2.0))
+
+    def search(self, text, vector, k, filters=None):
+        points = self.client.query_points(
+            self.collection_name,
+            query=vector.tolist(),
+            query_filter=make_filter(filters),
+            limit=k,
+            search_params=self.params,
+        ).points
+        return [point.payload['metadata']['image_id'] for point in points]
+
+
+def tokenize(text):
+    # BM25Retriever's default is a case-sensitive text.split(), which never matches
+    # lowercase queries against the capitalised styles.csv values
+    return text.lower().split()
+
+
+class BM25Retriever:
+    """BM25 over the metadata sentences (rank_bm25, like langchain's BM25Retriever)"""
+
+    def __init__(self, catalog):
+        from rank_bm25 import BM25Okapi
+
+        self.ids = catalog['id'].to_numpy()
+        self.bm25 = BM25Okapi([tokenize(sentence) for sentence in catalog['sentence']])
+        self.filter = _CatalogFilter(catalog)
+
+    def search(self, text, vector, k, filters=None):
+        rows = self.filter.rows(filters)
+        if rows is None:
+            return self.ids[_top_k(self.bm25.get_scores(tokenize(text)), k)].tolist()
+        scores = np.asarray(self.bm25.get_batch_scores(tokenize(text), rows.tolist()))
+        return self.ids[rows[_top_k(scores, k)]].tolist()
+
+
+class HybridRetriever:
+    """Weighted reciprocal-rank fusion of several retrievers (langchain EnsembleRetriever)"""
+
+    def __init__(self, retrievers, weights, c=RRF_C):
+        self.retrievers = retrievers
+        self.weights = weights
+        self.c = c
+
+    def search(self, text, vector, k, filters=None):
+        scores = {}
+        for retriever, weight in zip(self.retrievers, self.weights):
+            for rank, _id in enumerate(retriever.search(text, vector, k, filters), start=1):
+                scores[_id] = scores.get(_id, 0.0) + weight / (rank + self.c)
+        return sorted(scores, key=scores.get, reverse=True)[:k]
@@ -1,258 +1,234 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
+import asyncio
+import functools
 import os
-import shutil
-from gradio_client import Client, file
+from gradio_client import Client
 from flask_cors import CORS
 import requests
+import time
+from human_gate import setup_human_gate
+import metrics
+from handlers import Handlers, RequestError, Upload, default_cloth_image, shop_the_look_filters, validate_prompt
+from progress import NullProgress, predict_with_progress, run_in_background
+from text_to_cloth import TextToCloth, load_local_pipeline
 
 app = Flask(__name__)
 CORS(app) 
 # Initialize the Gradio client
 
-# Resolve important paths relative to this file
-BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.dirname(BACKEND_DIR)
-FRONTEND_PUBLIC_DIR = os.path.join(PROJECT_ROOT, 'frontend', 'public')
-UPLOADS_DIR = os.path.join(BACKEND_DIR, 'uploads')
-
-os.makedirs(UPLOADS_DIR, exist_ok=True)
-os.makedirs(FRONTEND_PUBLIC_DIR, exist_ok=True)
-
 # External service URLs via environment variables (fallback to current defaults)
 TRYON_URL = os.environ.get("TRYON_URL", "https://7395458a587bc50ec3.gradio.live/")
 CHATBOT_URL = os.environ.get("CHATBOT_URL", "https://fe81ff40040ecfff3c.gradio.live/")
 OCCASION_URL = os.environ.get("OCCASION_URL", "https://8c8e6f96c1fe2aefb7.gradio.live/")
+TEXT_TO_CLOTH_URL = os.environ.get("TEXT_TO_CLOTH_URL", "dhaan-ish/text-to-cloth")
+# Concurrent calls each Gradio client can have in flight (raise for the ASGI server)
+UPSTREAM_MAX_WORKERS = int(os.environ.get("UPSTREAM_MAX_WORKERS", "40"))
 
-def download_image(image_url):
+def download_image(image_url, file_path):
     try:
         image_url = image_url.strip()
         if not image_url:
             raise ValueError("Image URL cannot be empty")
 
-        # Name of the file to save the image as, with a .png extension
-        filename = "downloaded_image.png"
-
-        # Ensure the uploads directory exists
-        if not os.path.exists(UPLOADS_DIR):
-            os.makedirs(UPLOADS_DIR)
-
-        # Full path to the file
-        file_path = os.path.join(UPLOADS_DIR, filename)
-
-        # Make the request to download the image with timeout
-        response = requests.get(image_url, stream=True, timeout=30)
-
-        # Check if the request was successful
-        if response.status_code == 200:
-            # Open the file in write mode and write the content
-            with open(file_path, 'wb') as file:
-                for chunk in response.iter_content(chunk_size=128):
-                    file.write(chunk)
-            print(f"Image downloaded successfully and saved as {file_path}")
-            return True
-        else:
-            print(f"Failed to download image. Status code: {response.status_code}")
-            return False
+        with metrics.track_upstream('cloth_download'):
+            # Make the request to download the image with timeout
+            response = requests.get(image_url, stream=True, timeout=30)
+
+            # Check if the request was successful
+            if response.status_code == 200:
+                # Open the file in write mode and write the content
+                with open(file_path, 'wb') as file:
+                    for chunk in response.iter_content(chunk_size=128):
+                        file.write(chunk)
+                print(f"Image downloaded successfully and saved as {file_path}")
+                return True
+            else:
+                metrics.UPSTREAM_ERRORS.inc(service='cloth_download')
+                print(f"Failed to download image. Status code: {response.status_code}")
+                return False
     except Exception as e:
         print(f"Error downloading image: {str(e)}")
         return False
 
 
 #try on
-client = Client(TRYON_URL)
+client = Client(TRYON_URL, max_workers=UPSTREAM_MAX_WORKERS)
 
 #chatBot
-gradio_client = Client(CHATBOT_URL)
+gradio_client = Client(CHATBOT_URL, max_workers=UPSTREAM_MAX_WORKERS)
 
 #dress
-dress = Client("dhaan-ish/text-to-cloth")
+dress = Client(TEXT_TO_CLOTH_URL, max_workers=UPSTREAM_MAX_WORKERS)
+
+# Run the diffusion model in-process when TEXT_TO_CLOTH_LOCAL=1 so seeds are
+# honoured and several images come out of one batched call
+text_to_cloth = TextToCloth(
+    remote_client=dress,
+    pipeline=load_local_pipeline() if os.environ.get("TEXT_TO_CLOTH_LOCAL") == "1" else None,
+)
+
+# Rejects photos without a person before any remote try-on call (None = disabled)
+human_gate = setup_human_gate()
 
 #ocassion
 
-ocassion_client = Client(OCCASION_URL)
+ocassion_client = Client(OCCASION_URL, max_workers=UPSTREAM_MAX_WORKERS)
+
+@app.before_request
+def start_request_trace():
+    # Stage timings for this request; streaming routes hand it on to their worker
+    g.progress = NullProgress()
+    metrics.REQUESTS_IN_FLIGHT.inc()
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    duration = time.perf_counter() - g.progress.started
+    metrics.REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    # Streamed responses are only starting here; run_in_background times them when the worker finishes
+    if not response.is_streamed:
+        metrics.REQUEST_SECONDS.observe(duration, endpoint=endpoint)
+        metrics.log_if_slow(endpoint, duration, g.progress.stages)
+    return response
+
+
+@app.teardown_request
+def finish_request_trace(exc):
+    # The context is torn down before a streamed body is sent; its worker decrements instead
+    if not g.get('streaming'):
+        metrics.REQUESTS_IN_FLIGHT.dec()
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+class BlockingHandlers(Handlers):
+    """Route bodies for Flask: every call blocks the request (or stream worker) thread"""
+
+    async def predict(self, client, *args, **kwargs):
+        return predict_with_progress(client, *args, **kwargs)
+
+    async def run_blocking(self, fn, *args):
+        return fn(*args)
+
+    async def download(self, image_url, destination):
+        return download_image(image_url, destination)
+
+
+handlers = BlockingHandlers(client, gradio_client, ocassion_client, text_to_cloth, human_gate)
+
+
+def blocking(handler):
+    """Run a handler coroutine to completion on the calling thread"""
+    @functools.wraps(handler)
+    def run(*args):
+        return asyncio.run(handler(*args))
+    return run
+
+
+def uploaded_file():
+    upload = request.files.get('uploadedFile')
+    return Upload(upload.filename, upload.stream) if upload is not None else None
+
+
+def error_response(e, route):
+    if isinstance(e, RequestError):
+        return jsonify({'error': str(e)}), e.status_code
+    print(f"Error in {route}: {str(e)}")
+    return jsonify({'error': str(e)}), 500
+
+
+def stream_response(handler, *args):
+    """Run `handler` in the background and stream its progress as server-sent events"""
+    progress = run_in_background(blocking(handler), *args, parent=g.progress, endpoint=request.url_rule.rule)
+    g.streaming = True
+    return Response(
+        progress.events(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
 
 @app.route("/predict", methods=["POST"])
 def predict():
     try:
-        data = request.get_json()
-        if not data or "text" not in data:
-            return jsonify({"error": "Missing 'text' field in request"}), 400
-            
-        text_input = data["text"]
-        if not text_input or not text_input.strip():
-            return jsonify({"error": "Text input cannot be empty"}), 400
-            
-        print(f"Processing text input: {text_input}")
-
-        result = gradio_client.predict(
-            text_input.strip(),	# str  in 'text' Textbox component
-            api_name="/predict"
-        )
-        print(f"Prediction result: {result}")
-        return jsonify({"result": result})
+        return jsonify(blocking(handlers.chat)(g.progress, request.get_json()))
     except Exception as e:
-        print(f"Error in predict: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        return error_response(e, 'predict')
+
+def save_person_image(required=()):
+    print(request.files)
+    return blocking(handlers.save_person_image)(g.progress, uploaded_file(), request.form, required)
 
 @app.route('/uploadocassion', methods=['POST'])
 def upload_ocassion():
     try:
-        # Check if the request contains a file
-        print(request.files)
-        if 'uploadedFile' not in request.files:
-            return jsonify({'error': 'No file part'}), 400
-            
-        uploaded_file = request.files['uploadedFile']
-        if uploaded_file.filename == '':
-            return jsonify({'error': 'No selected file'}), 400
-            
-        # Check if URL is provided
-        if 'url' not in request.form or not request.form['url'].strip():
-            return jsonify({'error': 'URL is required'}), 400
-            
-        url = request.form['url'].strip()
-        print(f"Processing URL: {url}")
-        
-        # Download image from URL
-        download_image(url)
-        
-        if uploaded_file:
-            # Save the uploaded file
-            uploaded_file.save(os.path.join(UPLOADS_DIR, 'upload.png'))
-            
-            # Check if downloaded image exists
-            downloaded_path = os.path.join(UPLOADS_DIR, "downloaded_image.png")
-            if not os.path.exists(downloaded_path):
-                return jsonify({'error': 'Failed to download image from URL'}), 400
-            
-            print("Processing virtual try-on...")
-            # Use the Gradio client to make a prediction
-            result = client.predict(
-                file(downloaded_path), # filepath in 'cloth_image' Image component
-                file(os.path.join(UPLOADS_DIR, "upload.png")), # filepath in 'origin_image' Image component
-                api_name="/predict"
-            )
-            print(f"Try-on result: {result}")
-            
-            if not result or not os.path.exists(result):
-                return jsonify({'error': 'Virtual try-on failed'}), 500
-                
-            destination_dir = FRONTEND_PUBLIC_DIR
-            shutil.copy(result, destination_dir)
-            
-            return jsonify({'message': 'Result image copied successfully.'}), 200
+        person_image_path, fields = save_person_image(required=('url',))
+        result = blocking(handlers.try_on_from_url)(g.progress, person_image_path, fields['url'])
+        return jsonify({'message': result['message']}), 200
+    except Exception as e:
+        return error_response(e, 'upload_ocassion')
+
+@app.route('/uploadocassion/stream', methods=['POST'])
+def upload_ocassion_stream():
+    try:
+        person_image_path, fields = save_person_image(required=('url',))
+        return stream_response(handlers.try_on_from_url, person_image_path, fields['url'])
     except Exception as e:
-        print(f"Error in upload_ocassion: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return error_response(e, 'upload_ocassion_stream')
 
 @app.route('/upload', methods=['POST'])
 def upload_files():
     try:
-        print(request.files)
-        if 'uploadedFile' not in request.files:
-            return jsonify({'error': 'No file part'}), 400
-            
-        uploaded_file = request.files['uploadedFile']
-        if uploaded_file.filename == '':
-            return jsonify({'error': 'No selected file'}), 400
-            
-        if uploaded_file:
-            # Save the uploaded file
-            uploaded_file.save(os.path.join(UPLOADS_DIR, 'upload.png'))
-            
-            # Check if the default cloth image exists
-            cloth_image_path = os.path.join(FRONTEND_PUBLIC_DIR, "image.JPEG")
-            if not os.path.exists(cloth_image_path):
-                return jsonify({'error': 'Default cloth image not found'}), 400
-            
-            print("Processing virtual try-on...")
-            # Use the Gradio client to make a prediction
-            result = client.predict(
-                file(cloth_image_path), # filepath in 'cloth_image' Image component
-                file(os.path.join(UPLOADS_DIR, "upload.png")), # filepath in 'origin_image' Image component
-                api_name="/predict"
-            )
-            
-            if not result or not os.path.exists(result):
-                return jsonify({'error': 'Virtual try-on failed'}), 500
-                
-            print(f"Try-on result: {result}")
-            destination_dir = FRONTEND_PUBLIC_DIR
-            shutil.copy(result, destination_dir)
-            
-            return jsonify({'message': 'Result image copied successfully.'}), 200
+        cloth_image_path = default_cloth_image()
+        person_image_path, _ = save_person_image()
+        result = blocking(handlers.run_try_on)(g.progress, cloth_image_path, person_image_path)
+        return jsonify({'message': result['message']}), 200
     except Exception as e:
-        print(f"Error in upload_files: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return error_response(e, 'upload_files')
+
+@app.route('/upload/stream', methods=['POST'])
+def upload_files_stream():
+    try:
+        cloth_image_path = default_cloth_image()
+        person_image_path, _ = save_person_image()
+        return stream_response(handlers.run_try_on, cloth_image_path, person_image_path)
+    except Exception as e:
+        return error_response(e, 'upload_files_stream')
     
 @app.route('/handleprompt', methods=['POST'])
 def handle_prompt():
     try:
-        data = request.get_json()
-        if not data or 'prompt' not in data:
-            return jsonify({'error': 'Missing prompt field'}), 400
-            
-        prompt = data.get('prompt')
-        if not prompt or not prompt.strip():
-            return jsonify({'error': 'Prompt cannot be empty'}), 400
-            
-        print(f"Processing prompt: {prompt}")
-        result = dress.predict(
-            prompt.strip(),
-            api_name="/predict"
-        )
-        
-        if not result or not os.path.exists(result):
-            return jsonify({'error': 'Text-to-image generation failed'}), 500
-            
-        print(f"Generated image: {result}")
-        dress_dir = FRONTEND_PUBLIC_DIR
-        
-        shutil.copy(result, dress_dir)
-        print("Image generation completed successfully")
-        return jsonify({'message': 'Success'}), 200
+        args = validate_prompt(request.get_json())
+        return jsonify(blocking(handlers.generate_cloth)(g.progress, *args)), 200
+    except Exception as e:
+        return error_response(e, 'handle_prompt')
+
+@app.route('/handleprompt/stream', methods=['POST'])
+def handle_prompt_stream():
+    try:
+        args = validate_prompt(request.get_json())
+        return stream_response(handlers.generate_cloth, *args)
     except Exception as e:
-        print(f"Error in handle_prompt: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return error_response(e, 'handle_prompt_stream')
 
 @app.route('/handleocassion', methods=['POST'])
 def handleocassion():
     try:
-        # Extract data from the request
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'No JSON data provided'}), 400
-            
-        color = data.get('color')
-        selected_occasion = data.get('selectedOccasion')
-        
-        if not color or not color.strip():
-            return jsonify({'error': 'Color is required'}), 400
-        if not selected_occasion or not selected_occasion.strip():
-            return jsonify({'error': 'Occasion is required'}), 400
-            
-        print(f"Processing: {color} shirt for {selected_occasion}")
-        
-        # Make the prediction
-        result = ocassion_client.predict(
-            f"{color.strip()} shirt for {selected_occasion.strip()}",
-            api_name="/predict"
-        )
-
-        if not result:
-            return jsonify({'error': 'Failed to get recommendations'}), 500
-
-        # Process the result
-        new_items = result.split(",") if isinstance(result, str) else []
-
-        # Return the result as JSON
-        return jsonify({
-            'newItems': new_items,
-            'showRecommendations': True
-        })
+        return jsonify(blocking(handlers.recommend_for_occasion)(g.progress, request.get_json()))
+    except Exception as e:
+        return error_response(e, 'handleocassion')
+
+@app.route('/shopthelook', methods=['POST'])
+def shop_the_look():
+    try:
+        query_image_path = blocking(handlers.save_query_image)(g.progress, uploaded_file(), request.form)
+        return jsonify(blocking(handlers.shop_the_look)(g.progress, query_image_path, shop_the_look_filters(request.form)))
     except Exception as e:
-        print(f"Error in handleocassion: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return error_response(e, 'shop_the_look')
 
 if __name__ == '__main__':
     app.run(debug=True)
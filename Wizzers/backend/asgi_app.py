@@ -0,0 +1,270 @@
+"""
+ASGI serving mode for the Wizzers backend (run it with serve.py).
+
+Serves the same routes as app.py through the same handlers.Handlers bodies,
+but remote Gradio jobs are awaited on the event loop, cloth images are
+downloaded with an async HTTP client straight to disk, and multipart uploads
+are spooled to disk by the form parser instead of being held in memory. The
+Gradio clients, text-to-cloth generator and human gate are shared with app.py.
+
+Each remote Gradio job still occupies one gradio_client executor thread until it
+finishes, so in-flight upstream jobs are capped at UPSTREAM_MAX_WORKERS per client.
+"""
+
+import os
+import time
+from contextlib import asynccontextmanager
+
+import anyio
+import httpx
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import app as backend
+import metrics
+from handlers import Handlers, RequestError, Upload, default_cloth_image, shop_the_look_filters, validate_prompt
+from progress import NullProgress, apredict_with_progress, run_task
+
+# Blocking work (image decode/encode, local diffusion, file copies) shares this many threads
+BLOCKING_THREADS = int(os.environ.get("ASGI_BLOCKING_THREADS", "16"))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+_blocking_limiter = None
+_http_client = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global _blocking_limiter, _http_client
+    _blocking_limiter = anyio.CapacityLimiter(BLOCKING_THREADS)
+    _http_client = httpx.AsyncClient(timeout=30, follow_redirects=True)
+    try:
+        yield
+    finally:
+        await _http_client.aclose()
+
+
+async def run_blocking(fn, *args):
+    return await anyio.to_thread.run_sync(fn, *args, limiter=_blocking_limiter)
+
+
+def error_response(e, route):
+    if isinstance(e, RequestError):
+        return JSONResponse({'error': str(e)}, status_code=e.status_code)
+    print(f"Error in {route}: {str(e)}")
+    return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def uploaded_file(form):
+    upload = form.get('uploadedFile')
+    if upload is None or isinstance(upload, str):
+        return None
+    return Upload(upload.filename, upload.file)
+
+
+def stream_response(request, handler, *args):
+    """Run the `handler` coroutine as a task and stream its progress as server-sent events"""
+    progress = run_task(handler, *args, parent=request.state.progress, endpoint=request.url.path)
+    return StreamingResponse(
+        progress.events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+class MetricsMiddleware:
+    """ASGI counterpart of app.py's request hooks: per-request trace and metrics"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        progress = NullProgress()
+        scope.setdefault('state', {})['progress'] = progress
+        response = {'status': 500, 'streamed': False}
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                headers = dict(message.get('headers', []))
+                response['streamed'] = headers.get(b'content-type', b'').startswith(b'text/event-stream')
+            await send(message)
+
+        metrics.REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.REQUESTS_IN_FLIGHT.dec()
+            endpoint = scope['path'] if scope['path'] in ROUTE_PATHS else 'unmatched'
+            duration = time.perf_counter() - progress.started
+            metrics.REQUESTS.inc(endpoint=endpoint, status=response['status'])
+            metrics.REQUEST_SECONDS.observe(duration, endpoint=endpoint)
+            # Streaming workers log their own slow requests when they finish
+            if not response['streamed']:
+                metrics.log_if_slow(endpoint, duration, progress.stages)
+
+
+async def metrics_endpoint(request):
+    return Response(metrics.render(), media_type='text/plain; version=0.0.4')
+
+
+async def download_image(image_url, destination):
+    """Async app.download_image: streams the response body straight to `destination`"""
+    try:
+        with metrics.track_upstream('cloth_download'):
+            async with _http_client.stream('GET', image_url) as response:
+                if response.status_code != 200:
+                    metrics.UPSTREAM_ERRORS.inc(service='cloth_download')
+                    print(f"Failed to download image. Status code: {response.status_code}")
+                    return False
+                async with await anyio.open_file(destination, 'wb') as f:
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        await f.write(chunk)
+        print(f"Image downloaded successfully and saved as {destination}")
+        return True
+    except Exception as e:
+        print(f"Error downloading image: {str(e)}")
+        return False
+
+
+class AsyncHandlers(Handlers):
+    """Route bodies for the event loop: Gradio jobs are awaited, blocking work runs on threads"""
+
+    async def predict(self, client, *args, **kwargs):
+        return await apredict_with_progress(client, *args, **kwargs)
+
+    async def run_blocking(self, fn, *args):
+        return await run_blocking(fn, *args)
+
+    async def download(self, image_url, destination):
+        return await download_image(image_url, destination)
+
+
+handlers = AsyncHandlers(
+    backend.client, backend.gradio_client, backend.ocassion_client, backend.text_to_cloth, backend.human_gate
+)
+
+
+async def save_person_image(request, required=()):
+    # Starlette spools each file part to a temporary file on disk past 1 MB
+    form = await request.form()
+    try:
+        return await handlers.save_person_image(request.state.progress, uploaded_file(form), form, required)
+    finally:
+        await form.close()
+
+
+async def predict(request):
+    try:
+        return JSONResponse(await handlers.chat(request.state.progress, await read_json(request)))
+    except Exception as e:
+        return error_response(e, 'predict')
+
+
+async def upload_ocassion(request):
+    try:
+        person_image_path, fields = await save_person_image(request, required=('url',))
+        result = await handlers.try_on_from_url(request.state.progress, person_image_path, fields['url'])
+        return JSONResponse({'message': result['message']})
+    except Exception as e:
+        return error_response(e, 'upload_ocassion')
+
+
+async def upload_ocassion_stream(request):
+    try:
+        person_image_path, fields = await save_person_image(request, required=('url',))
+        return stream_response(request, handlers.try_on_from_url, person_image_path, fields['url'])
+    except Exception as e:
+        return error_response(e, 'upload_ocassion_stream')
+
+
+async def upload_files(request):
+    try:
+        cloth_image_path = default_cloth_image()
+        person_image_path, _ = await save_person_image(request)
+        result = await handlers.run_try_on(request.state.progress, cloth_image_path, person_image_path)
+        return JSONResponse({'message': result['message']})
+    except Exception as e:
+        return error_response(e, 'upload_files')
+
+
+async def upload_files_stream(request):
+    try:
+        cloth_image_path = default_cloth_image()
+        person_image_path, _ = await save_person_image(request)
+        return stream_response(request, handlers.run_try_on, cloth_image_path, person_image_path)
+    except Exception as e:
+        return error_response(e, 'upload_files_stream')
+
+
+async def handle_prompt(request):
+    try:
+        args = validate_prompt(await read_json(request))
+        return JSONResponse(await handlers.generate_cloth(request.state.progress, *args))
+    except Exception as e:
+        return error_response(e, 'handle_prompt')
+
+
+async def handle_prompt_stream(request):
+    try:
+        args = validate_prompt(await read_json(request))
+        return stream_response(request, handlers.generate_cloth, *args)
+    except Exception as e:
+        return error_response(e, 'handle_prompt_stream')
+
+
+async def handleocassion(request):
+    try:
+        return JSONResponse(await handlers.recommend_for_occasion(request.state.progress, await read_json(request)))
+    except Exception as e:
+        return error_response(e, 'handleocassion')
+
+
+async def shop_the_look(request):
+    try:
+        form = await request.form()
+        try:
+            query_image_path = await handlers.save_query_image(request.state.progress, uploaded_file(form), form)
+            filters = shop_the_look_filters(form)
+        finally:
+            await form.close()
+        return JSONResponse(await handlers.shop_the_look(request.state.progress, query_image_path, filters))
+    except Exception as e:
+        return error_response(e, 'shop_the_look')
+
+
+routes = [
+    Route('/metrics', metrics_endpoint, methods=['GET']),
+    Route('/predict', predict, methods=['POST']),
+    Route('/uploadocassion', upload_ocassion, methods=['POST']),
+    Route('/uploadocassion/stream', upload_ocassion_stream, methods=['POST']),
+    Route('/upload', upload_files, methods=['POST']),
+    Route('/upload/stream', upload_files_stream, methods=['POST']),
+    Route('/handleprompt', handle_prompt, methods=['POST']),
+    Route('/handleprompt/stream', handle_prompt_stream, methods=['POST']),
+    Route('/handleocassion', handleocassion, methods=['POST']),
+    Route('/shopthelook', shop_the_look, methods=['POST']),
+]
+ROUTE_PATHS = {route.path for route in routes}
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        Middleware(MetricsMiddleware),
+    ],
+    lifespan=lifespan,
+)
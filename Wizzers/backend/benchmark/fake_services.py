@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the Gradio services the backend calls.
+
+Starts one Gradio app per upstream service (try-on, chatbot, text-to-cloth,
+occasion) with the same `/predict` signature as the real one, but with
+configurable latency, response payload size and error rate, so the backend can
+be benchmarked without the remote GPUs.
+
+Usage:
+    python fake_services.py --latency 2.0 --error-rate 0.01
+    python fake_services.py --override tryon:latency=8 --override chatbot:payload_kb=4
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import gradio as gr
+import numpy as np
+from PIL import Image
+
+from services import BASE_PORT, SERVICE_ENV, SERVICES, service_url
+
+DEFAULT_PAYLOAD_KB = {
+    'tryon': 300,
+    'chatbot': 1,
+    'text_to_cloth': 300,
+    'occasion': 1,
+}
+
+
+def make_payload_image(size_kb, directory):
+    """Write an incompressible PNG of roughly `size_kb` kilobytes"""
+    side = max(8, int((size_kb * 1024 / 3) ** 0.5))
+    pixels = np.random.default_rng(0).integers(0, 256, (side, side, 3), dtype=np.uint8)
+    path = os.path.join(directory, f'payload_{size_kb}kb.png')
+    Image.fromarray(pixels).save(path)
+    return path
+
+
+class FakeBehaviour:
+    """Latency / error injection shared by every fake endpoint"""
+
+    def __init__(self, latency, jitter, error_rate):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+    def __call__(self):
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, delay))
+        if random.random() < self.error_rate:
+            raise gr.Error("Injected failure")
+
+
+def make_interface(**kwargs):
+    """gr.Interface that lets calls overlap, like the real deployments"""
+    try:
+        # Gradio 4 runs one call at a time per event unless told otherwise
+        return gr.Interface(concurrency_limit=None, **kwargs).queue()
+    except TypeError:
+        return gr.Interface(**kwargs).queue(concurrency_count=64)
+
+
+def make_tabs(*interfaces):
+    """Several interfaces served from one app, each keeping its own api_name"""
+    demo = gr.TabbedInterface(list(interfaces))
+    try:
+        return demo.queue(default_concurrency_limit=None)
+    except TypeError:
+        return demo.queue(concurrency_count=64)
+
+
+def build_service(service, behaviour, payload_kb, workdir):
+    """Build a Gradio Interface matching the real service's `/predict` signature"""
+    if service in ('tryon', 'text_to_cloth'):
+        image_path = make_payload_image(payload_kb, workdir)
+
+        if service == 'tryon':
+            def fn(cloth_image, origin_image):
+                behaviour()
+                return image_path
+            inputs = [gr.Image(type='filepath'), gr.Image(type='filepath')]
+        else:
+            def fn(prompt):
+                behaviour()
+                return image_path
+            inputs = 'text'
+        return make_interface(fn=fn, inputs=inputs, outputs=gr.Image(type='filepath'))
+
+    if service == 'chatbot':
+        reply = ("Try a navy blazer with white sneakers. " * 64)[:payload_kb * 1024]
+
+        def fn(text):
+            behaviour()
+            return reply
+    else:
+        link = "http://assets.myntassets.com/v1/images/style/properties/fake.jpg"
+        links = ", ".join([link] * max(1, payload_kb * 1024 // (len(link) + 2)))
+
+        def fn(text):
+            behaviour()
+            return links
+
+        # Predict.ipynb also serves image queries ("shop the look") as /shop_the_look
+        def shop_the_look(image, gender, article_type, base_colour):
+            behaviour()
+            return links
+
+        return make_tabs(
+            make_interface(fn=fn, inputs='text', outputs='text'),
+            make_interface(
+                fn=shop_the_look,
+                inputs=[gr.Image(type='filepath'), 'text', 'text', 'text'],
+                outputs='text',
+                api_name='shop_the_look',
+            ),
+        )
+    return make_interface(fn=fn, inputs='text', outputs='text')
+
+
+def parse_overrides(overrides):
+    """Turn ['tryon:latency=8', ...] into {'tryon': {'latency': 8.0}, ...}"""
+    parsed = {service: {} for service in SERVICES}
+    for override in overrides:
+        try:
+            service, setting = override.split(':', 1)
+            key, value = setting.split('=', 1)
+        except ValueError:
+            raise SystemExit(f"Invalid override {override!r}, expected service:key=value")
+        if service not in SERVICES:
+            raise SystemExit(f"Unknown service {service!r}, choose from {', '.join(SERVICES)}")
+        if key not in ('latency', 'jitter', 'error_rate', 'payload_kb'):
+            raise SystemExit(f"Unknown setting {key!r}")
+        parsed[service][key] = int(value) if key == 'payload_kb' else float(value)
+    return parsed
+
+
+def launch_all(args):
+    overrides = parse_overrides(args.override)
+    workdir = tempfile.mkdtemp(prefix='wizzers-fakes-')
+
+    for service in SERVICES:
+        settings = overrides[service]
+        behaviour = FakeBehaviour(
+            settings.get('latency', args.latency),
+            settings.get('jitter', args.jitter),
+            settings.get('error_rate', args.error_rate),
+        )
+        payload_kb = settings.get('payload_kb', args.payload_kb or DEFAULT_PAYLOAD_KB[service])
+        demo = build_service(service, behaviour, payload_kb, workdir)
+        demo.launch(
+            server_name='127.0.0.1',
+            server_port=args.base_port + SERVICES.index(service),
+            max_threads=args.concurrency,
+            prevent_thread_lock=True,
+            quiet=True,
+        )
+        print(f"✅ {service} ({SERVICE_ENV[service]}) -> {service_url(service, args.base_port)}", flush=True)
+
+    print("READY", flush=True)
+    while True:
+        time.sleep(3600)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-port', type=int, default=BASE_PORT)
+    parser.add_argument('--latency', type=float, default=1.0, help="Seconds each call takes")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Uniform +/- seconds added to latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of calls that fail")
+    parser.add_argument('--payload-kb', type=int, default=None, help="Response size for every service")
+    parser.add_argument('--concurrency', type=int, default=64, help="Worker threads per service")
+    parser.add_argument('--override', action='append', default=[], help="Per-service setting, e.g. tryon:latency=8")
+    launch_all(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for the Wizzers backend.
+
+Starts the fake upstream services (fake_services.py), a static server for the
+cloth image used by /uploadocassion and the backend itself, then drives each
+endpoint at a fixed concurrency and reports p50/p95/p99 latency and req/s.
+Results are written to results/<label>.json for comparison between runs.
+
+Usage:
+    python run.py --concurrency 16 --requests 200
+    python run.py --latency 5 --override chatbot:latency=0.5 --label slow-tryon
+    python run.py --compare results/baseline.json
+    python run.py --server asgi --label asgi --compare results/baseline.json
+    python run.py --backend-url http://127.0.0.1:5000 --no-fakes
+"""
+
+import argparse
+import functools
+import http.server
+import io
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from PIL import Image
+
+from services import BASE_PORT, SERVICE_ENV, SERVICES, service_url
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+
+ENDPOINTS = ('predict', 'upload', 'uploadocassion', 'handleprompt', 'handleocassion', 'shopthelook')
+BACKEND_PORT = 5055
+CLOTH_SERVER_PORT = 7880
+
+
+def make_jpeg(width, height, color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def wait_for_port(port, timeout=60, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode} before port {port} opened")
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for port {port}")
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    """Static file handler that doesn't log every request to stderr"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_cloth_server(directory, port):
+    """Serve the cloth image /uploadocassion downloads"""
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_fakes(args):
+    command = [
+        sys.executable, os.path.join(BENCHMARK_DIR, 'fake_services.py'),
+        '--base-port', str(args.fake_port),
+        '--latency', str(args.latency),
+        '--jitter', str(args.jitter),
+        '--error-rate', str(args.error_rate),
+    ]
+    if args.payload_kb is not None:
+        command += ['--payload-kb', str(args.payload_kb)]
+    for override in args.override:
+        command += ['--override', override]
+    process = subprocess.Popen(command)
+    for index in range(len(SERVICES)):
+        wait_for_port(args.fake_port + index, process=process)
+    return process
+
+
+def start_backend(args, workdir):
+    """Run the backend (Flask app.py or serve.py), writing only to a scratch directory"""
+    public_dir = os.path.join(workdir, 'public')
+    os.makedirs(public_dir)
+    # /upload tries the cloth shown in the chat UI
+    shutil.copy(
+        os.path.join(os.path.dirname(BACKEND_DIR), 'frontend', 'public', 'image.JPEG'),
+        os.path.join(public_dir, 'image.JPEG'),
+    )
+
+    env = dict(os.environ)
+    env.update({
+        'FRONTEND_PUBLIC_DIR': public_dir,
+        'UPLOADS_DIR': os.path.join(workdir, 'uploads'),
+        'TEXT_TO_CLOTH_CACHE_DIR': os.path.join(workdir, 'generated'),
+        'HUMAN_GATE': '1' if args.human_gate else '0',
+    })
+    if not args.no_fakes:
+        for service in SERVICES:
+            env[SERVICE_ENV[service]] = service_url(service, args.fake_port)
+
+    if args.server == 'asgi':
+        command = [sys.executable, 'serve.py', '--port', str(args.backend_port), '--log-level', 'warning']
+    else:
+        command = [
+            sys.executable, '-c',
+            f"from app import app; app.run(port={args.backend_port}, threaded=True)",
+        ]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    wait_for_port(args.backend_port, timeout=120, process=process)
+    return process
+
+
+def request_factory(endpoint, base_url, person_jpeg, cloth_url, unique_prompts, timeout):
+    """Return a callable that sends one request to `endpoint`"""
+    url = f"{base_url}/{endpoint}"
+
+    if endpoint == 'predict':
+        return lambda session: session.post(url, json={'text': 'What should I wear for a job interview?'}, timeout=timeout)
+    if endpoint == 'upload':
+        return lambda session: session.post(
+            url, files={'uploadedFile': ('person.jpg', person_jpeg, 'image/jpeg')}, timeout=timeout
+        )
+    if endpoint == 'uploadocassion':
+        return lambda session: session.post(
+            url,
+            files={'uploadedFile': ('person.jpg', person_jpeg, 'image/jpeg')},
+            data={'url': cloth_url},
+            timeout=timeout,
+        )
+    if endpoint == 'handleprompt':
+        def send(session):
+            # Unique prompts bypass the text-to-cloth cache unless asked otherwise
+            prompt = f"white shirt {uuid.uuid4().hex}" if unique_prompts else "white shirt"
+            return session.post(url, json={'prompt': prompt}, timeout=timeout)
+        return send
+    if endpoint == 'shopthelook':
+        return lambda session: session.post(
+            url,
+            files={'uploadedFile': ('look.jpg', person_jpeg, 'image/jpeg')},
+            data={'gender': 'Men', 'articleType': 'Shirts'},
+            timeout=timeout,
+        )
+    if endpoint == 'handleocassion':
+        return lambda session: session.post(url, json={'color': 'blue', 'selectedOccasion': 'wedding'}, timeout=timeout)
+    raise ValueError(f"Unknown endpoint {endpoint}")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values), max(1, math.ceil(fraction * len(sorted_values)))) - 1
+    return sorted_values[index]
+
+
+def run_endpoint(send, total, concurrency):
+    """Send `total` requests with `concurrency` workers; return latency stats"""
+    local = threading.local()
+
+    def one(_):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = send(local.session)
+            ok = response.status_code == 200
+            status = response.status_code
+        except requests.RequestException as e:
+            ok, status = False, type(e).__name__
+        return time.perf_counter() - start, ok, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, ok, _ in results if ok)
+    errors = {}
+    for _, ok, status in results:
+        if not ok:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        'requests': total,
+        'ok': len(latencies),
+        'errors': errors,
+        'wall_s': round(wall, 3),
+        'req_per_s': round(len(latencies) / wall, 2) if wall else 0.0,
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p95_ms': ms(percentile(latencies, 0.95)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+    }
+
+
+def print_report(results, baseline=None):
+    header = f"{'endpoint':<16}{'ok/total':>10}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print("\n" + header)
+    print("-" * len(header))
+    for endpoint, stats in results.items():
+        print(
+            f"{endpoint:<16}{stats['ok']:>5}/{stats['requests']:<4}{stats['req_per_s']:>9}"
+            f"{str(stats['p50_ms']):>10}{str(stats['p95_ms']):>10}{str(stats['p99_ms']):>10}"
+        )
+        if stats['errors']:
+            print(f"{'':<16}errors: {stats['errors']}")
+        if baseline and endpoint in baseline:
+            old = baseline[endpoint]
+            deltas = []
+            for key in ('req_per_s', 'p50_ms', 'p95_ms', 'p99_ms'):
+                if old.get(key) and stats.get(key) is not None:
+                    deltas.append(f"{key} {100 * (stats[key] - old[key]) / old[key]:+.1f}%")
+            if deltas:
+                print(f"{'':<16}vs baseline: {', '.join(deltas)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoints', nargs='+', default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100, help="Requests per endpoint")
+    parser.add_argument('--warmup', type=int, default=2, help="Untimed requests per endpoint")
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--label', default=None, help="Name of the results file (default: timestamp)")
+    parser.add_argument('--compare', default=None, help="Previous results JSON to compare against")
+    parser.add_argument('--backend-url', default=None, help="Benchmark an already running backend")
+    parser.add_argument('--backend-port', type=int, default=BACKEND_PORT)
+    parser.add_argument('--server', choices=('flask', 'asgi'), default='flask', help="Backend serving mode")
+    parser.add_argument('--no-fakes', action='store_true', help="Don't start fake upstream services")
+    parser.add_argument('--fake-port', type=int, default=BASE_PORT)
+    parser.add_argument('--human-gate', action='store_true', help="Keep the human gate enabled")
+    parser.add_argument('--cache-hits', action='store_true', help="Reuse one prompt for /handleprompt")
+    parser.add_argument('--person-size', default='3024x4032', help="Size of the uploaded person photo")
+    # Passed through to fake_services.py
+    parser.add_argument('--latency', type=float, default=1.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--payload-kb', type=int, default=None)
+    parser.add_argument('--override', action='append', default=[])
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    processes = []
+    workdir = tempfile.mkdtemp(prefix='wizzers-bench-')
+    try:
+        if not args.no_fakes and not args.backend_url:
+            print("🚀 Starting fake upstream services...")
+            processes.append(start_fakes(args))
+
+        cloth_dir = os.path.join(workdir, 'cloth')
+        os.makedirs(cloth_dir)
+        with open(os.path.join(cloth_dir, 'cloth.jpg'), 'wb') as f:
+            f.write(make_jpeg(768, 1024, (240, 240, 240)))
+        cloth_server = start_cloth_server(cloth_dir, CLOTH_SERVER_PORT)
+        cloth_url = f"http://127.0.0.1:{CLOTH_SERVER_PORT}/cloth.jpg"
+
+        base_url = args.backend_url
+        if not base_url:
+            print("🚀 Starting backend...")
+            processes.append(start_backend(args, workdir))
+            base_url = f"http://127.0.0.1:{args.backend_port}"
+        base_url = base_url.rstrip('/')
+
+        width, height = (int(v) for v in args.person_size.split('x'))
+        person_jpeg = make_jpeg(width, height, (180, 150, 120))
+
+        results = {}
+        for endpoint in args.endpoints:
+            send = request_factory(
+                endpoint, base_url, person_jpeg, cloth_url, not args.cache_hits, args.timeout
+            )
+            if args.warmup:
+                run_endpoint(send, args.warmup, 1)
+            print(f"⏱️  {endpoint}: {args.requests} requests at concurrency {args.concurrency}")
+            results[endpoint] = run_endpoint(send, args.requests, args.concurrency)
+        cloth_server.shutdown()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results, baseline)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    label = args.label or datetime.now().strftime('%Y%m%d-%H%M%S')
+    output_path = os.path.join(RESULTS_DIR, f'{label}.json')
+    config = {key: value for key, value in vars(args).items() if key not in ('compare', 'label')}
+    with open(output_path, 'w') as f:
+        json.dump({'label': label, 'timestamp': datetime.now().isoformat(), 'config': config, 'results': results}, f, indent=2)
+    print(f"\n💾 Results saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+Ports and environment variables of the fake upstream services.
+
+Kept free of gradio so run.py can benchmark an already running backend
+(--backend-url ... --no-fakes) without gradio installed.
+"""
+
+SERVICES = ('tryon', 'chatbot', 'text_to_cloth', 'occasion')
+BASE_PORT = 7870
+
+# Environment variable the backend reads for each service URL
+SERVICE_ENV = {
+    'tryon': 'TRYON_URL',
+    'chatbot': 'CHATBOT_URL',
+    'text_to_cloth': 'TEXT_TO_CLOTH_URL',
+    'occasion': 'OCCASION_URL',
+}
+
+
+def service_url(service, base_port=BASE_PORT, host='127.0.0.1'):
+    return f"http://{host}:{base_port + SERVICES.index(service)}/"
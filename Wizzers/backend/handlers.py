@@ -0,0 +1,338 @@
+"""
+Request handling shared by the Flask app (app.py) and the ASGI app (asgi_app.py).
+
+The apps only adapt requests and responses: they pull the JSON body, form
+fields and uploaded file out of their framework's request, call a Handlers
+method, and turn the returned payload or a RequestError into a response.
+
+The request bodies are coroutines that await `predict`, `run_blocking` and
+`download`, which each app supplies in a Handlers subclass: app.py implements
+them with blocking calls and runs the coroutine with asyncio.run on the request
+thread, asgi_app.py awaits the Gradio jobs and runs blocking work on threads.
+"""
+
+import functools
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from gradio_client import file
+from PIL import UnidentifiedImageError
+
+from preprocess import QUERY_SHORT_SIDE, prepare_image
+from text_to_cloth import parse_seeds, parse_steps, prune_cache
+
+# Resolve important paths relative to this file
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BACKEND_DIR)
+FRONTEND_PUBLIC_DIR = os.environ.get("FRONTEND_PUBLIC_DIR", os.path.join(PROJECT_ROOT, 'frontend', 'public'))
+UPLOADS_DIR = os.environ.get("UPLOADS_DIR", os.path.join(BACKEND_DIR, 'uploads'))
+
+os.makedirs(UPLOADS_DIR, exist_ok=True)
+os.makedirs(FRONTEND_PUBLIC_DIR, exist_ok=True)
+
+# An uploaded file as the apps hand it over: its client-side name and a readable binary stream
+Upload = namedtuple('Upload', ['filename', 'stream'])
+
+
+class RequestError(Exception):
+    """A request the client has to fix; answered with {'error': message} and `status_code`"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def upload_path(prefix, request_id, extension):
+    """Per-request file in uploads/, so concurrent try-ons never share files"""
+    return os.path.join(UPLOADS_DIR, f"{prefix}-{request_id}.{extension}")
+
+
+def remove_quietly(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def default_cloth_path():
+    """The cloth image shown in the chat UI (replaced by /handleprompt)"""
+    return os.path.join(FRONTEND_PUBLIC_DIR, "image.JPEG")
+
+
+def copy_atomically(source, destination):
+    """Copy via a temp file so concurrent readers never see a partly written image"""
+    tmp_path = f"{destination}.{uuid.uuid4().hex}.tmp"
+    shutil.copy(source, tmp_path)
+    os.replace(tmp_path, destination)
+
+
+def validate_text(data):
+    """Check a /predict body; returns the chatbot prompt"""
+    if not data or "text" not in data:
+        raise RequestError("Missing 'text' field in request")
+
+    text_input = data["text"]
+    if not text_input or not text_input.strip():
+        raise RequestError("Text input cannot be empty")
+    return text_input.strip()
+
+
+def validate_occasion(data):
+    """Check a /handleocassion body; returns (color, occasion)"""
+    if not data:
+        raise RequestError('No JSON data provided')
+
+    color = data.get('color')
+    selected_occasion = data.get('selectedOccasion')
+
+    if not color or not color.strip():
+        raise RequestError('Color is required')
+    if not selected_occasion or not selected_occasion.strip():
+        raise RequestError('Occasion is required')
+    return color.strip(), selected_occasion.strip()
+
+
+def validate_prompt(data):
+    """Check a /handleprompt body; returns (prompt, seeds, steps)"""
+    if not data or 'prompt' not in data:
+        raise RequestError('Missing prompt field')
+
+    prompt = data.get('prompt')
+    if not prompt or not prompt.strip():
+        raise RequestError('Prompt cannot be empty')
+
+    try:
+        return prompt.strip(), parse_seeds(data), parse_steps(data)
+    except (TypeError, ValueError) as e:
+        raise RequestError(str(e))
+
+
+def form_value(form, field):
+    """Stripped text value of a form field ('' when missing or a file)"""
+    value = form.get(field)
+    return value.strip() if isinstance(value, str) else ''
+
+
+def required_fields(form, fields):
+    """{field: value} for form fields that must be non-empty"""
+    values = {}
+    for field in fields:
+        values[field] = form_value(form, field)
+        if not values[field]:
+            raise RequestError(f'{field.upper()} is required')
+    return values
+
+
+def shop_the_look_filters(form):
+    """Optional gender / articleType / baseColour pre-filters, in the service's argument order"""
+    return tuple(form_value(form, field) for field in ('gender', 'articleType', 'baseColour'))
+
+
+def recommendations(result):
+    """Response body for the product-recommendation routes"""
+    return {
+        'newItems': result.split(",") if isinstance(result, str) else [],
+        'showRecommendations': True
+    }
+
+
+def default_cloth_image():
+    """The cloth /upload tries on; only there once /handleprompt has generated one"""
+    cloth_image_path = default_cloth_path()
+    if not os.path.exists(cloth_image_path):
+        raise RequestError('Default cloth image not found')
+    return cloth_image_path
+
+
+class Handlers(ABC):
+    """Route bodies for both apps.
+
+    Subclasses implement `predict` (a progress-reporting Gradio call),
+    `run_blocking` and `download` for their serving model.
+    """
+
+    def __init__(self, tryon_client, chatbot_client, occasion_client, text_to_cloth, human_gate=None):
+        self.tryon_client = tryon_client
+        self.chatbot_client = chatbot_client
+        self.occasion_client = occasion_client
+        self.text_to_cloth = text_to_cloth
+        self.human_gate = human_gate
+
+    @abstractmethod
+    async def predict(self, client, *args, **kwargs):
+        """predict_with_progress(client, *args, **kwargs) for this app"""
+
+    @abstractmethod
+    async def run_blocking(self, fn, *args):
+        """Return fn(*args) without stalling other requests more than this app must"""
+
+    @abstractmethod
+    async def download(self, image_url, destination):
+        """Fetch `image_url` into `destination`; returns False if it could not be downloaded"""
+
+    async def chat(self, progress, data):
+        text_input = validate_text(data)
+        print(f"Processing text input: {text_input}")
+
+        with progress.stage('chatbot'):
+            result = await self.predict(self.chatbot_client, text_input, service='chatbot')
+        print(f"Prediction result: {result}")
+        return {"result": result}
+
+    async def recommend_for_occasion(self, progress, data):
+        color, selected_occasion = validate_occasion(data)
+        print(f"Processing: {color} shirt for {selected_occasion}")
+
+        with progress.stage('recommend'):
+            result = await self.predict(
+                self.occasion_client,
+                f"{color} shirt for {selected_occasion}",
+                service='occasion',
+            )
+
+        if not result:
+            raise RequestError('Failed to get recommendations', 500)
+        return recommendations(result)
+
+    async def save_person_image(self, progress, upload, form, required=()):
+        """Validate the try-on upload and save the person photo to uploads/.
+
+        Returns (person_image_path, {field: value} for the `required` form fields).
+        """
+        if upload is None:
+            raise RequestError('No file part')
+        if not upload.filename:
+            raise RequestError('No selected file')
+        fields = required_fields(form, required)
+
+        person_image_path = upload_path('upload', uuid.uuid4().hex, 'jpg')
+        try:
+            with progress.stage('save_upload'):
+                person_image = await self.run_blocking(prepare_image, upload.stream, person_image_path)
+        except UnidentifiedImageError:
+            raise RequestError('Uploaded file is not a valid image')
+
+        if self.human_gate is not None:
+            with progress.stage('human_gate'):
+                is_human = (await self.run_blocking(self.human_gate.is_human, person_image))[0]
+            if not is_human:
+                print("Rejected upload: no person detected")
+                remove_quietly(person_image_path)
+                raise RequestError('No person detected in the uploaded photo', 422)
+        return person_image_path, fields
+
+    async def save_query_image(self, progress, upload, form):
+        """Save the shop-the-look photo: an upload, or a try-on result named by the `image` field"""
+        image_name = form_value(form, 'image')
+        if upload is not None and upload.filename:
+            source = upload.stream
+        elif image_name:
+            # Only results the backend copied to the frontend's public folder
+            source = os.path.join(FRONTEND_PUBLIC_DIR, os.path.basename(image_name))
+            if not os.path.isfile(source):
+                raise RequestError('Image not found', 404)
+        else:
+            raise RequestError('Upload a photo or name a try-on result image')
+
+        query_image_path = upload_path('query', uuid.uuid4().hex, 'jpg')
+        try:
+            with progress.stage('save_upload'):
+                await self.run_blocking(functools.partial(prepare_image, short_side=QUERY_SHORT_SIDE), source, query_image_path)
+        except UnidentifiedImageError:
+            raise RequestError('Uploaded file is not a valid image')
+        return query_image_path
+
+    async def shop_the_look(self, progress, query_image_path, filters):
+        """Recommend catalog products that look like the saved query photo"""
+        try:
+            with progress.stage('recommend'):
+                result = await self.predict(
+                    self.occasion_client,
+                    file(query_image_path),
+                    *filters,
+                    api_name="/shop_the_look",
+                    service='occasion',
+                )
+        finally:
+            remove_quietly(query_image_path)
+        return recommendations(result)
+
+    async def run_try_on(self, progress, cloth_image_path, person_image_path):
+        """Send the cloth and saved person photo to the try-on service"""
+        try:
+            with progress.stage('try_on'):
+                print("Processing virtual try-on...")
+                result = await self.predict(
+                    self.tryon_client,
+                    file(cloth_image_path), # filepath in 'cloth_image' Image component
+                    file(person_image_path), # filepath in 'origin_image' Image component
+                    progress=progress,
+                    stage='try_on',
+                    service='tryon',
+                )
+                print(f"Try-on result: {result}")
+        finally:
+            remove_quietly(person_image_path)
+
+        if not result or not os.path.exists(result):
+            raise RuntimeError('Virtual try-on failed')
+
+        with progress.stage('copy_result'):
+            await self.run_blocking(shutil.copy, result, FRONTEND_PUBLIC_DIR)
+
+        return {'message': 'Result image copied successfully.', 'image': os.path.basename(result)}
+
+    async def try_on_from_url(self, progress, person_image_path, url):
+        """Download the cloth image from `url`, then run the try-on"""
+        print(f"Processing URL: {url}")
+        request_id = uuid.uuid4().hex
+        downloaded_path = upload_path('downloaded', request_id, 'png')
+        cloth_image_path = upload_path('cloth', request_id, 'jpg')
+        try:
+            with progress.stage('download_cloth'):
+                downloaded = await self.download(url, downloaded_path)
+            if not downloaded or not os.path.exists(downloaded_path):
+                raise RequestError('Failed to download image from URL')
+
+            with progress.stage('preprocess_cloth'):
+                try:
+                    await self.run_blocking(prepare_image, downloaded_path, cloth_image_path)
+                except UnidentifiedImageError:
+                    raise RequestError('URL does not point to a valid image')
+
+            return await self.run_try_on(progress, cloth_image_path, person_image_path)
+        finally:
+            remove_quietly(person_image_path, downloaded_path, cloth_image_path)
+
+    async def generate_cloth(self, progress, prompt, seeds, steps):
+        """Generate cloth images and copy them where the frontend reads them"""
+        # Diffusion and the image cache are blocking
+        return await self.run_blocking(self._generate_cloth, progress, prompt, seeds, steps)
+
+    def _generate_cloth(self, progress, prompt, seeds, steps):
+        print(f"Processing prompt: {prompt} (seeds={seeds}, steps={steps})")
+        results = self.text_to_cloth.generate(prompt, seeds, steps, progress=progress)
+
+        if not results or not all(os.path.exists(result) for result in results):
+            raise RuntimeError('Text-to-image generation failed')
+
+        print(f"Generated images: {results}")
+        with progress.stage('copy_result'):
+            # The first image replaces the cloth shown in chat and used by /upload
+            copy_atomically(results[0], default_cloth_path())
+
+            # Public copies are named by cache key, so concurrent prompts can't overwrite each other
+            images = []
+            applied_steps = self.text_to_cloth.effective_steps(steps)
+            for seed, result in zip(seeds, results):
+                name = f"generated_{os.path.basename(result)}"
+                copy_atomically(result, os.path.join(FRONTEND_PUBLIC_DIR, name))
+                images.append({'seed': seed, 'steps': applied_steps, 'image': name})
+            prune_cache(FRONTEND_PUBLIC_DIR, prefix='generated_')
+
+        print("Image generation completed successfully")
+        return {'message': 'Success', 'images': images}
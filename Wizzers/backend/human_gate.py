@@ -0,0 +1,88 @@
+"""
+Human-presence pre-check for the virtual try-on routes.
+
+Runs the 150x150 human / non-human CNN from Human-Identification/train.ipynb
+(exported to TFLite by Human-Identification/export_tflite.py) on CPU, so photos
+without a person are rejected in milliseconds instead of going through the
+remote try-on pipeline.
+"""
+
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HUMAN_MODEL_PATH = os.environ.get(
+    "HUMAN_MODEL_PATH", os.path.join(BACKEND_DIR, 'models', 'human_classifier.tflite')
+)
+# Same threshold as the notebook: scores below it are "non-human"
+HUMAN_THRESHOLD = float(os.environ.get("HUMAN_THRESHOLD", "0.5"))
+INPUT_SIZE = (150, 150)
+
+
+def load_interpreter(model_path):
+    """Create a TFLite interpreter, preferring the small tflite-runtime package"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite import Interpreter
+    return Interpreter(model_path=model_path, num_threads=os.cpu_count())
+
+
+def preprocess(image):
+    """Prepare a PIL image or path the way train.ipynb does: RGB, 150x150 (nearest), scaled to [0, 1]"""
+    if not isinstance(image, Image.Image):
+        with Image.open(image) as img:
+            return preprocess(img)
+    img = image.convert('RGB').resize(INPUT_SIZE, Image.NEAREST)
+    return np.asarray(img, dtype=np.float32) / 255.0
+
+
+class HumanGate:
+    """Batched human / non-human classifier backed by a TFLite interpreter"""
+
+    def __init__(self, interpreter, threshold=HUMAN_THRESHOLD):
+        self.interpreter = interpreter
+        self.threshold = threshold
+        self._input = interpreter.get_input_details()[0]['index']
+        self._output = interpreter.get_output_details()[0]['index']
+        self._batch_size = None
+        # A TFLite interpreter must not be invoked from two threads at once
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        """Return the human score for each image in an (n, 150, 150, 3) batch"""
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input, batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self._input, batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output)[:, 0].copy()
+
+    def is_human(self, *images):
+        """True for each image (PIL image or path) whose score reaches the threshold"""
+        scores = self.predict(np.stack([preprocess(image) for image in images]))
+        return [bool(score >= self.threshold) for score in scores]
+
+
+def setup_human_gate():
+    """Load the gate, or return None (gate disabled) if it is switched off or unavailable"""
+    if os.environ.get("HUMAN_GATE", "1") == "0":
+        return None
+    if not os.path.exists(HUMAN_MODEL_PATH):
+        print(f"⚠️  Human gate disabled: model not found at {HUMAN_MODEL_PATH}")
+        print("   Export it with: python Human-Identification/export_tflite.py <model.keras>")
+        return None
+    try:
+        gate = HumanGate(load_interpreter(HUMAN_MODEL_PATH))
+        print("✅ Human gate loaded")
+        return gate
+    except Exception as e:
+        print(f"❌ Human gate disabled: {e}")
+        return None
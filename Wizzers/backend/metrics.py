@@ -0,0 +1,157 @@
+"""
+In-process metrics for the Wizzers backend, exposed in Prometheus text format.
+
+Counters, gauges and histograms are kept in plain dicts behind one lock each;
+recording a value is a dict lookup and a bisect, so the hot path stays cheap
+and no metrics library is needed.
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; remote try-on / diffusion calls routinely take tens of seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Requests slower than this are logged with their stage breakdown (0 = off)
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "0"))
+
+_registry = []
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(key, self._copy(value)) for key, value in self._values.items()]
+        for key, value in sorted(items):
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _copy(self, value):
+        return value
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(key)} {value}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket (non-cumulative) counts + [sum, count]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def _render_value(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else repr(float(bound))
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+REQUESTS = Counter('wizzers_requests_total', "HTTP requests by endpoint and status code")
+REQUEST_SECONDS = Histogram('wizzers_request_seconds', "HTTP request latency by endpoint")
+REQUESTS_IN_FLIGHT = Gauge('wizzers_requests_in_flight', "HTTP requests currently being handled")
+STAGE_SECONDS = Histogram('wizzers_stage_seconds', "Time spent in each request stage")
+UPSTREAM_SECONDS = Histogram('wizzers_upstream_seconds', "Latency of calls to upstream services")
+UPSTREAM_ERRORS = Counter('wizzers_upstream_errors_total', "Failed calls to upstream services")
+UPSTREAM_IN_FLIGHT = Gauge('wizzers_upstream_in_flight', "Upstream calls currently running")
+
+
+@contextmanager
+def track_upstream(service):
+    """Time one call to an upstream service and count it if it raises"""
+    UPSTREAM_IN_FLIGHT.inc(service=service)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.inc(service=service)
+        raise
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, service=service)
+        UPSTREAM_IN_FLIGHT.dec(service=service)
+
+
+def log_if_slow(endpoint, duration, stages):
+    """Print the stage breakdown of a request that took longer than SLOW_REQUEST_MS"""
+    if not SLOW_REQUEST_MS or duration * 1000 < SLOW_REQUEST_MS:
+        return
+    breakdown = ', '.join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in stages) or 'no stages'
+    print(f"Slow request {endpoint}: {duration * 1000:.0f}ms ({breakdown})")
+
+
+def render():
+    """All metrics in Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
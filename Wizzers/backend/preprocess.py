@@ -0,0 +1,57 @@
+"""
+Image preprocessing before upstream try-on calls.
+
+Uploaded photos are decoded once, rotated according to their EXIF orientation,
+downscaled to the try-on model's native resolution and re-encoded as JPEG, so
+multi-megabyte phone photos are not shipped to the remote service as-is.
+"""
+
+import os
+
+from PIL import Image, ImageOps
+
+# HR-VITON works at 768x1024 (width x height); anything larger is wasted upload
+TRYON_SIZE = (768, 1024)
+# CLIP resizes the short side to 224 and takes the centre crop; shop-the-look photos
+# keep a 448px short side so that crop is only ever downsampled, whatever the aspect ratio
+QUERY_SHORT_SIDE = 448
+JPEG_QUALITY = int(os.environ.get("UPLOAD_JPEG_QUALITY", "90"))
+
+
+def flatten_to_rgb(img):
+    """Convert to RGB, compositing transparent images (product cut-outs) onto white"""
+    if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.convert('RGBA').getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+
+def prepare_image(source, destination, max_size=TRYON_SIZE, short_side=None):
+    """Decode `source` (path or file object), fix orientation, downscale and save as JPEG.
+
+    The image is shrunk to fit `max_size`, or, when `short_side` is given, until
+    its shorter side is `short_side` pixels. Returns the processed PIL image so
+    callers (e.g. the human gate) can reuse it without decoding the file again.
+    Raises PIL.UnidentifiedImageError if `source` is not an image.
+    """
+    with Image.open(source) as img:
+        # Let the decoder drop resolution early for large JPEGs (DCT scaling); it
+        # keeps both sides at least this long, and EXIF rotation may still swap the axes
+        side = short_side or max(max_size)
+        img.draft('RGB', (side, side))
+        img = ImageOps.exif_transpose(img)
+        img = flatten_to_rgb(img)
+
+    # Only ever shrink, keeping the aspect ratio; the remote model pads/crops itself
+    if short_side:
+        scale = short_side / min(img.size)
+        if scale < 1:
+            img = img.resize((round(img.width * scale), round(img.height * scale)), Image.LANCZOS)
+    else:
+        img.thumbnail(max_size, Image.LANCZOS)
+
+    tmp_path = destination + ".tmp"
+    img.save(tmp_path, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+    os.replace(tmp_path, destination)
+    return img
@@ -0,0 +1,249 @@
+"""
+Progress events for long-running generation requests.
+
+A ProgressStream collects stage, status and preview events from a worker thread
+and renders them as server-sent events, so the frontend can show intermediate
+results while a try-on or text-to-cloth request is still running.
+"""
+
+import asyncio
+import base64
+import io
+import json
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import REQUEST_SECONDS, REQUESTS_IN_FLIGHT, STAGE_SECONDS, log_if_slow, track_upstream
+
+# How often a remote Gradio job is polled for queue/progress updates
+POLL_INTERVAL = 0.5
+
+# Approximate linear map from Stable Diffusion VAE latents to RGB; good enough
+# for a thumbnail and far cheaper than running the VAE decoder every few steps
+LATENT_RGB_FACTORS = [
+    [0.3512, 0.2297, 0.3227],
+    [0.3250, 0.4974, 0.2350],
+    [-0.2829, 0.1762, 0.2721],
+    [-0.2120, -0.2616, -0.7177],
+]
+
+_CLOSE = object()
+
+
+class NullProgress:
+    """Progress sink used by the regular (non-streaming) routes.
+
+    Emits nothing, but still times every stage for /metrics and the
+    slow-request log.
+    """
+
+    streaming = False
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+
+    def emit(self, event, **data):
+        pass
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            self.stages.append((name, duration))
+            STAGE_SECONDS.observe(duration, stage=name)
+
+
+class ProgressStream(NullProgress):
+    """Thread-safe event queue for one request"""
+
+    streaming = True
+
+    def __init__(self, parent=None):
+        super().__init__()
+        self._queue = queue.Queue()
+        if parent is not None:
+            # Continue the request's trace (e.g. the upload already saved)
+            self.started = parent.started
+            self.stages = list(parent.stages)
+
+    def emit(self, event, **data):
+        data['elapsed_ms'] = int((time.perf_counter() - self.started) * 1000)
+        self._put((event, data))
+
+    def _put(self, item):
+        self._queue.put(item)
+
+    @contextmanager
+    def stage(self, name):
+        self.emit('stage', stage=name, state='started')
+        with super().stage(name):
+            yield
+        self.emit(
+            'stage',
+            stage=name,
+            state='completed',
+            duration_ms=int(self.stages[-1][1] * 1000),
+        )
+
+    def close(self):
+        self._put(_CLOSE)
+
+    def events(self):
+        """Yield server-sent event frames until the worker closes the stream"""
+        while True:
+            item = self._queue.get()
+            if item is _CLOSE:
+                return
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class AsyncProgressStream(ProgressStream):
+    """ProgressStream consumed from an asyncio event loop (ASGI serving mode)"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+    def _put(self, item):
+        # Workers may emit from a thread as well as from the loop itself
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    async def events(self):
+        """Yield server-sent event frames until the worker closes the stream"""
+        while True:
+            item = await self._queue.get()
+            if item is _CLOSE:
+                return
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def run_in_background(worker, *args, parent=None, endpoint=None):
+    """Run `worker(progress, *args)` on a thread and return its ProgressStream.
+
+    The worker's return value is sent as a `result` event, an exception as an
+    `error` event; the stream is closed either way. Flask's after_request and
+    teardown run before the stream is consumed, so the request duration and the
+    end of the in-flight request are recorded here.
+    """
+    progress = ProgressStream(parent)
+
+    def target():
+        try:
+            progress.emit('result', **worker(progress, *args))
+        except Exception as e:
+            print(f"Error in {worker.__name__}: {str(e)}")
+            progress.emit('error', error=str(e))
+        finally:
+            progress.close()
+            endpoint_name = endpoint or worker.__name__
+            duration = time.perf_counter() - progress.started
+            REQUEST_SECONDS.observe(duration, endpoint=endpoint_name)
+            REQUESTS_IN_FLIGHT.dec()
+            log_if_slow(endpoint_name, duration, progress.stages)
+
+    threading.Thread(target=target, daemon=True).start()
+    return progress
+
+
+_background_tasks = set()
+
+
+def run_task(worker, *args, parent=None, endpoint=None):
+    """asyncio counterpart of run_in_background for coroutine workers.
+
+    The ASGI MetricsMiddleware already times the whole stream, so only the
+    slow-request log is written here.
+    """
+    progress = AsyncProgressStream(parent)
+
+    async def target():
+        try:
+            progress.emit('result', **(await worker(progress, *args)))
+        except Exception as e:
+            print(f"Error in {worker.__name__}: {str(e)}")
+            progress.emit('error', error=str(e))
+        finally:
+            progress.close()
+            log_if_slow(endpoint or worker.__name__, time.perf_counter() - progress.started, progress.stages)
+
+    # Keep a reference so the task is not garbage-collected mid-flight
+    task = asyncio.get_running_loop().create_task(target())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return progress
+
+
+def _report_status(job, progress, stage, last):
+    """Emit a `status` event if the Gradio job's queue state changed"""
+    status = job.status()
+    code = getattr(status.code, 'name', str(status.code))
+    current = (code, status.rank, status.eta)
+    if current != last:
+        progress.emit('status', stage=stage, code=code, rank=status.rank, eta=status.eta)
+    return current
+
+
+def predict_with_progress(client, *args, api_name="/predict", progress=None, stage=None, service=None):
+    """Call a Gradio endpoint, reporting queue position and progress while it runs"""
+    with track_upstream(service or stage or api_name):
+        if progress is None or not progress.streaming:
+            return client.predict(*args, api_name=api_name)
+
+        job = client.submit(*args, api_name=api_name)
+        last = None
+        while not job.done():
+            last = _report_status(job, progress, stage, last)
+            time.sleep(POLL_INTERVAL)
+        return job.result()
+
+
+def predict_all_with_progress(client, calls, api_name="/predict", progress=None, stage=None, service=None):
+    """Submit one Gradio job per argument tuple in `calls` at once and wait for all of them.
+
+    Results come back in call order. The jobs run concurrently on the client's
+    executor, so N calls take roughly as long as the slowest one.
+    """
+    with track_upstream(service or stage or api_name):
+        jobs = [client.submit(*args, api_name=api_name) for args in calls]
+        if progress is not None and progress.streaming:
+            last = [None] * len(jobs)
+            while not all(job.done() for job in jobs):
+                for index, job in enumerate(jobs):
+                    last[index] = _report_status(job, progress, stage, last[index])
+                time.sleep(POLL_INTERVAL)
+        return [job.result() for job in jobs]
+
+
+async def apredict_with_progress(client, *args, api_name="/predict", progress=None, stage=None, service=None):
+    """Async predict_with_progress: awaits the Gradio job instead of blocking on it"""
+    with track_upstream(service or stage or api_name):
+        job = client.submit(*args, api_name=api_name)
+        if progress is not None and progress.streaming:
+            last = None
+            while not job.done():
+                last = _report_status(job, progress, stage, last)
+                await asyncio.sleep(POLL_INTERVAL)
+        return await asyncio.wrap_future(job.future)
+
+
+def latents_to_preview(latents):
+    """Turn one (4, h, w) latent tensor into a small PNG data URL"""
+    import torch
+    from PIL import Image
+
+    factors = torch.tensor(LATENT_RGB_FACTORS, dtype=latents.dtype, device=latents.device)
+    rgb = torch.einsum('chw,cr->hwr', latents, factors)
+    rgb = ((rgb + 1) / 2).clamp(0, 1).mul(255).byte().cpu().numpy()
+
+    buffer = io.BytesIO()
+    Image.fromarray(rgb).save(buffer, format='PNG')
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode('ascii')
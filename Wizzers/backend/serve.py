@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Production launcher for the Wizzers backend.
+
+Runs the ASGI serving mode (asgi_app.py) on uvicorn instead of Flask's
+development server, with the upstream Gradio clients sized for many
+concurrent slow try-on calls.
+
+Usage:
+    python serve.py
+    python serve.py --host 0.0.0.0 --port 8000 --workers 2
+"""
+
+import argparse
+import os
+
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes")
+    parser.add_argument(
+        '--upstream-workers', type=int, default=int(os.environ.get("UPSTREAM_MAX_WORKERS", "256")),
+        help="Concurrent calls each Gradio client may have in flight (default: $UPSTREAM_MAX_WORKERS or 256)",
+    )
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+
+    # Read by app.py when the Gradio clients are created, in every worker process
+    os.environ["UPSTREAM_MAX_WORKERS"] = str(args.upstream_workers)
+
+    uvicorn.run(
+        "asgi_app:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        # Try-on uploads are sent right after the page loads; keep the connection warm
+        timeout_keep_alive=30,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Text-to-cloth generation for the Wizzers backend.
+
+Several seeds for one prompt are generated in a single batched diffusion call
+(locally) or as concurrently submitted jobs (remote Space), concurrent requests
+for the same (prompt, seed, steps) share one in-flight generation, and finished
+images are cached on disk so a repeated key is served without regenerating.
+The cache is kept under TEXT_TO_CLOTH_CACHE_MAX_MB by evicting the least
+recently used images.
+"""
+
+import functools
+import hashlib
+import os
+import shutil
+import threading
+
+from progress import NullProgress, latents_to_preview, predict_all_with_progress
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATED_DIR = os.environ.get("TEXT_TO_CLOTH_CACHE_DIR", os.path.join(BACKEND_DIR, 'generated'))
+
+DEFAULT_STEPS = int(os.environ.get("TEXT_TO_CLOTH_STEPS", "30"))
+DEFAULT_SEED = 42
+MAX_IMAGES = int(os.environ.get("TEXT_TO_CLOTH_MAX_IMAGES", "4"))
+# Upper bound so one request cannot hold the diffusion pipeline indefinitely
+MAX_STEPS = int(os.environ.get("TEXT_TO_CLOTH_MAX_STEPS", "100"))
+# torch.Generator.manual_seed accepts unsigned 64-bit seeds
+MAX_SEED = 2 ** 64 - 1
+CACHE_MAX_BYTES = int(float(os.environ.get("TEXT_TO_CLOTH_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+# Emit a low-resolution preview every N diffusion steps on streaming requests
+PREVIEW_EVERY = int(os.environ.get("TEXT_TO_CLOTH_PREVIEW_EVERY", "5"))
+
+# Same base model and fashion LoRA as Text-To-Outfit-Generator/TextToCloth.ipynb
+BASE_MODEL = "stabilityai/stable-diffusion-2"
+FASHION_ATTN_PROCS = "NouRed/sd-fashion-products"
+
+os.makedirs(GENERATED_DIR, exist_ok=True)
+
+
+def cache_key(prompt, seed, steps):
+    """Stable file name for one (prompt, seed, steps) generation; steps=None when not applied"""
+    parts = [prompt, str(seed)] if steps is None else [prompt, str(seed), str(steps)]
+    digest = hashlib.sha1("\x00".join(parts).encode("utf-8")).hexdigest()
+    return f"{digest}.png"
+
+
+def prune_cache(directory, max_bytes=CACHE_MAX_BYTES, prefix=''):
+    """Delete the least recently used `<prefix>*.png` files until the rest fit in `max_bytes`"""
+    entries = []
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith('.png'):
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _as_int(value):
+    """int(value) that refuses to truncate: 1.7 raises ValueError instead of becoming 1"""
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"{value} is not an integer")
+    return int(value)
+
+
+def parse_seeds(data):
+    """Read `seeds` / `num_images` from a request body into a list of ints"""
+    seeds = data.get('seeds')
+    num_images = data.get('num_images')
+
+    if seeds is not None:
+        if not isinstance(seeds, list) or not seeds:
+            raise ValueError("'seeds' must be a non-empty list of integers")
+        try:
+            seeds = [_as_int(seed) for seed in seeds]
+        except (TypeError, ValueError):
+            raise ValueError("'seeds' must be a non-empty list of integers")
+        if any(seed < 0 or seed > MAX_SEED for seed in seeds):
+            raise ValueError(f"Seeds must be between 0 and {MAX_SEED}")
+
+    try:
+        num_images = _as_int(num_images) if num_images is not None else None
+    except (TypeError, ValueError):
+        raise ValueError("'num_images' must be an integer")
+
+    if seeds is not None:
+        if num_images is not None and num_images != len(seeds):
+            raise ValueError("'num_images' does not match the number of seeds")
+    else:
+        num_images = num_images if num_images is not None else 1
+        if num_images < 1:
+            raise ValueError("'num_images' must be at least 1")
+        seeds = [DEFAULT_SEED + i for i in range(num_images)]
+
+    if len(seeds) > MAX_IMAGES:
+        raise ValueError(f"At most {MAX_IMAGES} images can be generated per request")
+
+    # Duplicate seeds would produce identical images; keep the first occurrence
+    return list(dict.fromkeys(seeds))
+
+
+def parse_steps(data):
+    """Read `steps` from a request body"""
+    try:
+        steps = _as_int(data.get('steps', DEFAULT_STEPS))
+    except (TypeError, ValueError):
+        raise ValueError("'steps' must be an integer")
+    if steps < 1 or steps > MAX_STEPS:
+        raise ValueError(f"'steps' must be between 1 and {MAX_STEPS}")
+    return steps
+
+
+def load_local_pipeline():
+    """Load the diffusion pipeline locally (only when TEXT_TO_CLOTH_LOCAL=1)"""
+    import torch
+    from diffusers import DiffusionPipeline
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    pipeline = DiffusionPipeline.from_pretrained(BASE_MODEL, torch_dtype=torch.float32)
+    pipeline = pipeline.to(device)
+    pipeline.unet.load_attn_procs(FASHION_ATTN_PROCS)
+    pipeline.set_progress_bar_config(disable=True)
+    return pipeline
+
+
+class _InFlight:
+    """A generation that other requests for the same key can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.path = None
+        self.error = None
+
+
+class TextToCloth:
+    """Batched, deduplicated and cached text-to-cloth generation"""
+
+    def __init__(self, remote_client=None, pipeline=None):
+        self.remote_client = remote_client
+        self.pipeline = pipeline
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        # Only one diffusion batch runs at a time; the model is not re-entrant
+        self._pipeline_lock = threading.Lock()
+
+    def effective_steps(self, steps):
+        """The step count actually applied: the hosted Space has a fixed one (None)"""
+        return steps if self.pipeline is not None else None
+
+    def generate(self, prompt, seeds, steps=DEFAULT_STEPS, progress=None):
+        """Return one cached image path per seed, generating missing ones in one batch"""
+        progress = progress or NullProgress()
+        prompt = prompt.strip()
+        # Remote results don't depend on `steps`, so it must not split the cache
+        steps = self.effective_steps(steps)
+        owned = {}
+        waiting = {}
+        paths = {}
+
+        with self._lock:
+            for seed in seeds:
+                key = cache_key(prompt, seed, steps)
+                path = os.path.join(GENERATED_DIR, key)
+                if os.path.exists(path):
+                    # Mark as recently used so pruning evicts older images first
+                    os.utime(path)
+                    paths[seed] = path
+                elif key in self._in_flight:
+                    waiting[seed] = self._in_flight[key]
+                else:
+                    entry = _InFlight()
+                    self._in_flight[key] = entry
+                    owned[seed] = (key, entry)
+
+        if owned:
+            self._run_owned(prompt, steps, owned, progress)
+            for seed, (_, entry) in owned.items():
+                paths[seed] = entry.path
+
+        for seed, entry in waiting.items():
+            if not entry.done.is_set():
+                progress.emit('status', stage='generate', code='WAITING_FOR_DUPLICATE', seed=seed)
+            entry.done.wait()
+            if entry.error is not None:
+                raise entry.error
+            paths[seed] = entry.path
+
+        return [paths[seed] for seed in seeds]
+
+    def _run_owned(self, prompt, steps, owned, progress):
+        """Generate the seeds this request claimed and release their waiters"""
+        try:
+            with progress.stage('generate'):
+                results = self._generate_batch(prompt, list(owned), steps, progress)
+            for seed, (key, entry) in owned.items():
+                entry.path = os.path.join(GENERATED_DIR, key)
+                tmp_path = entry.path + ".tmp"
+                results[seed](tmp_path)
+                os.replace(tmp_path, entry.path)
+            prune_cache(GENERATED_DIR)
+        except Exception as e:
+            for _, entry in owned.values():
+                entry.error = e
+            raise
+        finally:
+            with self._lock:
+                for key, entry in owned.values():
+                    self._in_flight.pop(key, None)
+                    entry.done.set()
+
+    def _generate_batch(self, prompt, seeds, steps, progress):
+        """Run generation and return a writer callable per seed"""
+        if self.pipeline is not None:
+            return self._generate_local(prompt, seeds, steps, progress)
+        return self._generate_remote(prompt, seeds, progress)
+
+    def _generate_local(self, prompt, seeds, steps, progress):
+        import torch
+
+        generators = [
+            torch.Generator(device=self.pipeline.device).manual_seed(seed) for seed in seeds
+        ]
+
+        def on_step_end(pipeline, step, timestep, callback_kwargs):
+            done = step + 1
+            if done % PREVIEW_EVERY == 0 and done < steps:
+                latents = callback_kwargs['latents']
+                for seed, latent in zip(seeds, latents):
+                    progress.emit(
+                        'preview',
+                        seed=seed,
+                        step=done,
+                        steps=steps,
+                        image=latents_to_preview(latent),
+                    )
+            return callback_kwargs
+
+        extra = {'callback_on_step_end': on_step_end} if progress.streaming else {}
+        with self._pipeline_lock:
+            images = self.pipeline(
+                [prompt] * len(seeds),
+                num_inference_steps=steps,
+                generator=generators,
+                **extra,
+            ).images
+        # Written to a .tmp path first, so PIL can't infer the format from the extension
+        return {seed: functools.partial(image.save, format='PNG') for seed, image in zip(seeds, images)}
+
+    def _generate_remote(self, prompt, seeds, progress):
+        # The hosted Space takes only a prompt, so each seed is one remote job, all
+        # submitted together; the cache is what keeps a key's result stable afterwards.
+        if self.remote_client is None:
+            raise RuntimeError("No text-to-cloth backend configured")
+        results = predict_all_with_progress(
+            self.remote_client,
+            [(prompt,)] * len(seeds),
+            progress=progress,
+            stage='generate',
+            service='text_to_cloth',
+        )
+        writers = {}
+        for seed, result in zip(seeds, results):
+            if not result or not os.path.exists(result):
+                raise RuntimeError("Text-to-image generation failed")
+            writers[seed] = lambda dest, src=result: shutil.copy(src, dest)
+        return writers